@@ -1,70 +1,152 @@
+import numpy as np
 import pandas as pd
 import re
+from typing import Callable, Dict, Optional, Sequence
+
+_EMAIL_RE = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,63}$")
+_PHONE_RE = re.compile(r"^\+?(\d[\s\-]?)?(\(?\d{2,4}\)?[\s\-]?)?[\d\s\-]{6,15}\d$")
+_DATE_RE = re.compile(r"^(?:(?:\d{4}[-/]\d{1,2}[-/]\d{1,2})|(?:\d{1,2}[-/]\d{1,2}[-/]\d{4}))$")
+_USERID_RE = re.compile(r"^[a-zA-Z0-9\-_]+$")
+_STATUSES = frozenset({"active", "inactive", "pending"})
+
+_CHUNK_SIZE = 50
+
+
+def _ratio_exceeds(values: Sequence, predicate: Callable, threshold: float = 0.8,
+                   inclusive: bool = False) -> bool:
+    """
+    Check whether the share of values satisfying a predicate is above a threshold.
+
+    Values are scanned in chunks and the scan stops as soon as the remaining
+    values can no longer change the outcome.
+
+    Args:
+        values: Non-empty sequence of values to test
+        predicate: Callable returning a truthy value for matching values
+        threshold: Ratio the match share is compared against
+        inclusive: Accept a share equal to the threshold
+
+    Returns:
+        True if the match ratio exceeds (or, if inclusive, reaches) the threshold
+    """
+    total = len(values)
+
+    def passes(count: int) -> bool:
+        ratio = count / total
+        return ratio >= threshold if inclusive else ratio > threshold
+
+    matched = 0
+    for start in range(0, total, _CHUNK_SIZE):
+        matched += sum(1 for value in values[start:start + _CHUNK_SIZE] if predicate(value))
+        remaining = max(total - start - _CHUNK_SIZE, 0)
+        if passes(matched):
+            return True
+        if not passes(matched + remaining):
+            return False
+    return False
+
+
+def _as_str(series: pd.Series) -> pd.Series:
+    """Drop nulls and return string values, skipping the copy when already textual."""
+    non_null = series.dropna()
+    # Object columns may mix types, so check the values rather than the dtype alone
+    if pd.api.types.infer_dtype(non_null, skipna=False) == "string":
+        return non_null
+    return non_null.astype(str)
+
+
+def _age_ratio(values: np.ndarray) -> float:
+    """Share of a float64 array lying within the valid age range (0–150)."""
+    # NaN fails both comparisons, so coerced non-numeric values never count
+    return np.count_nonzero((values >= 0) & (values <= 150)) / values.size
+
+
+def _to_float(non_null: pd.Series) -> Optional[np.ndarray]:
+    """Numeric view of a null-free series as float64 (NaN where unparseable), or None on failure."""
+    try:
+        return pd.to_numeric(non_null, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    except Exception:
+        return None
+
+
+def _mostly_matching(text: np.ndarray, pattern: re.Pattern) -> bool:
+    return text.size > 0 and _ratio_exceeds(text, pattern.match)
+
+
+def _mostly_ages(numeric: Optional[np.ndarray]) -> bool:
+    return numeric is not None and numeric.size > 0 and _age_ratio(numeric) > 0.8
+
+
+def _mostly_user_ids(text: np.ndarray) -> bool:
+    if text.size == 0:
+        return False
+    unique_ratio = len(pd.unique(text)) / text.size
+    # Heuristic: mostly unique, alphanumeric, no obvious semantic pattern
+    return unique_ratio > 0.9 and _ratio_exceeds(text, _USERID_RE.match)
+
+
+def _mostly_statuses(raw: np.ndarray) -> bool:
+    if raw.size == 0:
+        return False
+
+    def is_status(value) -> bool:
+        # Normalise each value in a single pass instead of chaining .str operations
+        return str(value).strip().lower() in _STATUSES
+
+    # Heuristic: consider it a status column if ≥80% of values match expected statuses
+    return _ratio_exceeds(raw, is_status, inclusive=True)
+
 
 class ColumnClassifier:
+    @staticmethod
+    def prepare(series: pd.Series) -> Dict[str, Optional[np.ndarray]]:
+        """Extract the null-free raw, text and numeric views of a column in one go."""
+        non_null = series.dropna()
+        return {
+            "raw": non_null.to_numpy(),
+            "text": _as_str(non_null).to_numpy(),
+            "numeric": _to_float(non_null),
+        }
+
+    @staticmethod
+    def classify(series: pd.Series) -> Dict[str, bool]:
+        """Run every content check against a column, preparing its values only once."""
+        column = ColumnClassifier.prepare(series)
+        return {
+            "email": _mostly_matching(column["text"], _EMAIL_RE),
+            "phone": _mostly_matching(column["text"], _PHONE_RE),
+            "date": _mostly_matching(column["text"], _DATE_RE),
+            "age": _mostly_ages(column["numeric"]),
+            "user_id": _mostly_user_ids(column["text"]),
+            "status": _mostly_statuses(column["raw"]),
+        }
+
     @staticmethod
     def is_email(series: pd.Series) -> bool:
         """Check if a series contains email addresses."""
-        email_regex = re.compile("^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,63}$")
-        non_null = series.dropna().astype(str)
-        if non_null.empty:
-            return False
-        match_count = non_null.str.match(email_regex).sum()
-        return match_count / len(non_null) > 0.8
+        return _mostly_matching(_as_str(series).to_numpy(), _EMAIL_RE)
 
     @staticmethod
     def is_phone_number(series: pd.Series) -> bool:
         """Check if a series contains phone numbers."""
-        phone_regex = re.compile(r"^\+?(\d[\s\-]?)?(\(?\d{2,4}\)?[\s\-]?)?[\d\s\-]{6,15}\d$")
-        non_null = series.dropna().astype(str)
-        if non_null.empty:
-            return False
-        match_count = non_null.str.match(phone_regex).sum()
-        return match_count / len(non_null) > 0.8
+        return _mostly_matching(_as_str(series).to_numpy(), _PHONE_RE)
 
     @staticmethod
     def is_date(series: pd.Series) -> bool:
         """Check if a series contains date-like strings."""
-        date_regex =  re.compile(r"^(?:(?:\d{4}[-/]\d{1,2}[-/]\d{1,2})|(?:\d{1,2}[-/]\d{1,2}[-/]\d{4}))$")
-        non_null = series.dropna().astype(str)
-        if non_null.empty:
-            return False
-        match_count = non_null.str.match(date_regex).sum()
-        return match_count / len(non_null) > 0.8
+        return _mostly_matching(_as_str(series).to_numpy(), _DATE_RE)
 
     @staticmethod
     def is_age(series: pd.Series) -> bool:
         """Check if a series contains age values (0–150)."""
-        non_null = series.dropna()
-        if non_null.empty:
-            return False
-        try:
-            numeric = pd.to_numeric(non_null, errors='coerce')
-            valid = numeric[(numeric >= 0) & (numeric <= 150)]
-            return len(valid) / len(non_null) > 0.8
-        except Exception:
-            return False
+        return _mostly_ages(_to_float(series.dropna()))
 
     @staticmethod
     def is_user_id(series: pd.Series) -> bool:
         """Check if a series contains unique user identifiers."""
-        non_null = series.dropna().astype(str)
-        if non_null.empty:
-            return False
-        unique_ratio = non_null.nunique() / len(non_null)
-        # Heuristic: mostly unique, alphanumeric, no obvious semantic pattern
-        alphanumeric_ratio = non_null.str.match(r"^[a-zA-Z0-9\-_]+$").sum() / len(non_null)
-        return unique_ratio > 0.9 and alphanumeric_ratio > 0.8
+        return _mostly_user_ids(_as_str(series).to_numpy())
 
     @staticmethod
     def is_status_code(series: pd.Series) -> bool:
         """Check if a series contains status values: active, inactive, pending (case-insensitive)."""
-        non_null = series.dropna().astype(str).str.strip().str.lower()
-        if non_null.empty:
-            return False
-
-        valid_statuses = {"active", "inactive", "pending"}
-        match_ratio = non_null.isin(valid_statuses).sum() / len(non_null)
-
-        # Heuristic: consider it a status column if ≥80% of values match expected statuses
-        return match_ratio >= 0.8
\ No newline at end of file
+        return _mostly_statuses(series.dropna().to_numpy())
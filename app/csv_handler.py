@@ -2,18 +2,28 @@
 CSV file handling utilities for parsing and processing CSV files.
 """
 import pandas as pd
+import csv
 import io
 import os
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
+# Strings read_csv treats as missing by default. Must mirror pandas' default
+# na_values (pandas only exposes them from a private module).
+_NA_TOKENS = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+})
+
 class CSVHandler:
     """Handles CSV file parsing and column detection."""
     
     MAX_FILE_SIZE = 100 * 1024 * 1024  # 100 MB in bytes
     SAMPLE_SIZE = 1000  # Number of rows to sample for preview
+    UPLOADS_DIR = Path(__file__).parent.parent / "uploads"
+    HEADER_PROBE_BYTES = 64 * 1024  # Leading bytes read for header detection (grown if needed)
     
     def __init__(self, file_content: bytes, filename: str):
         """
@@ -24,17 +34,31 @@ class CSVHandler:
             filename: Original filename
         """
         self.file_content = file_content
+        self.file_size = len(file_content)
         self.filename = filename
         self.df: Optional[pd.DataFrame] = None
         self.has_header: bool = True
         self.columns: List[str] = []
+    
+    def persist(self) -> Path:
+        """
+        Save the raw upload to the uploads folder.
+        
+        Must be called before parse(), which releases the raw bytes. The
+        client-supplied filename is reduced to its final component, so an
+        upload can never be written outside the uploads folder itself.
         
-        # Save file to uploads folder
-        uploads_dir = Path(__file__).parent.parent / "uploads"
-        uploads_dir.mkdir(exist_ok=True)
-        file_path = uploads_dir / filename
+        Returns:
+            Path of the written file
+        """
+        name = Path(self.filename or "").name
+        if name in ("", ".", ".."):
+            name = "upload.csv"
+        self.UPLOADS_DIR.mkdir(exist_ok=True)
+        file_path = self.UPLOADS_DIR / name
         with open(file_path, 'wb') as f:
-            f.write(file_content)
+            f.write(self.file_content)
+        return file_path
         
     def validate_file_size(self) -> Tuple[bool, Optional[str]]:
         """
@@ -43,31 +67,70 @@ class CSVHandler:
         Returns:
             Tuple of (is_valid, error_message)
         """
-        file_size = len(self.file_content)
-        if file_size > self.MAX_FILE_SIZE:
-            size_mb = file_size / (1024 * 1024)
+        if self.file_size > self.MAX_FILE_SIZE:
+            size_mb = self.file_size / (1024 * 1024)
             return False, f"File size ({size_mb:.2f} MB) exceeds maximum allowed size (100 MB)"
         return True, None
     
+    def _leading_records(self, count: int = 2) -> List[List[str]]:
+        """
+        Read the first records straight from the raw bytes, without a pandas parse.
+        
+        Blank lines are skipped, and records wider than the first one are dropped
+        like pandas' on_bad_lines='skip' would.
+        
+        Args:
+            count: Number of records to return
+            
+        Returns:
+            Up to `count` records as lists of field strings
+        """
+        size = self.HEADER_PROBE_BYTES
+        while True:
+            head = self.file_content[:size]
+            complete = len(head) >= len(self.file_content)
+            if not complete:
+                # Only decode whole lines; a cut-off record could change its type vector
+                head = head[:head.rfind(b"\n") + 1]
+            
+            records = []
+            for row in csv.reader(io.StringIO(head.decode("utf-8-sig", errors="replace"))):
+                if not row or (records and len(row) > len(records[0])):
+                    continue
+                records.append(row)
+                if len(records) == count:
+                    return records
+            
+            if complete:
+                return records
+            size *= 2
+    
     def detect_header(self) -> bool:
-        df = pd.read_csv(io.BytesIO(self.file_content), header=None, on_bad_lines='skip', nrows=2)
-        if len(df) < 2:
+        records = self._leading_records(2)
+        if len(records) < 2:
             return True  # Default to header if only one row
 
         def type_vector(row):
+            # Short rows are padded with missing values, as pandas does
+            row = row + [""] * (len(records[0]) - len(row))
             return [1 if is_numeric(val) else 0 for val in row]
 
         def is_numeric(val):
+            # Empty fields and pandas' default NA tokens parse as NaN, which counts as numeric
+            if not val.strip() or val in _NA_TOKENS:
+                return True
             try:
                 float(val)
                 return True
-            except:
+            except ValueError:
                 return False
 
-        vec0 = np.array(type_vector(df.iloc[0])).reshape(1, -1)
-        vec1 = np.array(type_vector(df.iloc[1])).reshape(1, -1)
+        vec0 = np.array(type_vector(records[0]), dtype=np.float64)
+        vec1 = np.array(type_vector(records[1]), dtype=np.float64)
 
-        similarity = cosine_similarity(vec0, vec1)[0][0]
+        # Cosine similarity; an all-zero vector yields 0 rather than dividing by zero
+        norm = np.linalg.norm(vec0) * np.linalg.norm(vec1)
+        similarity = float(vec0 @ vec1 / norm) if norm else 0.0
         print(f"Row similarity score: {similarity:.2f}")
 
         # High similarity → likely no header
@@ -89,20 +152,26 @@ class CSVHandler:
             # Detect if file has header
             self.has_header = self.detect_header()
             
-            # Parse CSV
+            # Parse CSV in a single pass, reusing the header decision from the probe above.
+            # The C engine is pinned: the pyarrow engine rejects on_bad_lines in pandas 2.1.
+            self.df = pd.read_csv(
+                io.BytesIO(self.file_content),
+                header=0 if self.has_header else None,
+                on_bad_lines='skip',
+                engine='c'
+            )
+            
             if self.has_header:
-                self.df = pd.read_csv(io.BytesIO(self.file_content), on_bad_lines='skip')
-                self.columns = list(self.df.columns)
+                # Clean column names (strip whitespace)
+                self.columns = [str(col).strip() for col in self.df.columns]
             else:
-                self.df = pd.read_csv(io.BytesIO(self.file_content), header=None, on_bad_lines='skip')
                 # Generate column names: Column_0, Column_1, etc.
                 self.columns = [f"Column_{i}" for i in range(len(self.df.columns))]
-                self.df.columns = self.columns
-            
-            # Clean column names (strip whitespace)
-            self.columns = [str(col).strip() for col in self.columns]
             self.df.columns = self.columns
             
+            # The parsed frame now holds the data; release the raw upload bytes
+            self.file_content = b""
+            
             return True, None
             
         except pd.errors.EmptyDataError:
@@ -112,6 +181,20 @@ class CSVHandler:
         except Exception as e:
             return False, f"Error processing CSV file: {str(e)}"
     
+    @staticmethod
+    def _json_safe(frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replace NaN and infinite values with None so the frame serializes to valid JSON.
+        
+        Args:
+            frame: DataFrame to clean
+            
+        Returns:
+            Object-dtype copy of the frame with missing/infinite values set to None
+        """
+        frame = frame.astype(object)
+        return frame.where(frame.notna() & ~frame.isin([np.inf, -np.inf]), None)
+    
     def get_preview(self, num_rows: int = 5) -> List[Dict]:
         """
         Get a preview of the CSV data.
@@ -125,7 +208,7 @@ class CSVHandler:
         if self.df is None:
             return []
         
-        preview_df = self.df.head(num_rows)
+        preview_df = self._json_safe(self.df.head(num_rows))
         return preview_df.to_dict(orient='records')
     
     def get_data(self, skip_rows: int = 0, num_rows: int = 10) -> List[Dict]:
@@ -163,7 +246,7 @@ class CSVHandler:
                 "type": str(self.df[col].dtype),
                 "non_null_count": int(self.df[col].count()),
                 "null_count": int(self.df[col].isna().sum()),
-                "sample_values": self.df[col].dropna().head(3).tolist()
+                "sample_values": self._json_safe(self.df[[col]].dropna().head(3))[col].tolist()
             }
             column_info.append(info)
         
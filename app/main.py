@@ -1,20 +1,21 @@
 """
 FastAPI application for CSV ingestion and mapping tool.
 """
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import Optional, Dict, List
+import asyncio
 import os
 
 from app.csv_handler import CSVHandler
 from app.mapper import MappingSuggester, MappingValidator
 from app.mapping_storage import MappingStorage
+from app.upload_cache import UploadCache
 from app.schema import SCHEMA_FIELDS, get_required_fields, get_all_fields
 import numpy as np
 import pandas as pd
-import math
 
 app = FastAPI(
     title="CSV Ingestion and Mapping Tool",
@@ -29,8 +30,12 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 mapping_storage = MappingStorage(storage_dir="mappings")
 mapping_suggester = MappingSuggester()
 
-# In-memory storage for uploaded files
-uploaded_files: Dict[str, CSVHandler] = {}
+# Keep a copy of raw uploads on disk (opt-in; parsing works from memory)
+PERSIST_UPLOADS = os.environ.get("PERSIST_UPLOADS", "").lower() in ("1", "true", "yes")
+
+# Parsed uploads: bounded in memory, least recently used entries spill to a private
+# temporary directory, out of reach of persisted uploads
+uploaded_files = UploadCache()
 
 class MappingRequest(BaseModel):
     """Request model for mapping configuration."""
@@ -52,19 +57,6 @@ class ValidateRequest(BaseModel):
     max_error_rows: Optional[int] = 5
 
 
-def sanitize_json(obj):
-    if isinstance(obj, dict):
-        return {k: sanitize_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [sanitize_json(v) for v in obj]
-    elif isinstance(obj, float):
-        if math.isnan(obj) or math.isinf(obj):
-            return None  # or a placeholder like "N/A"
-        return obj
-    else:
-        return obj
-
-
 @app.get("/", response_class=HTMLResponse)
 async def root():
     """Serve the main UI."""
@@ -111,17 +103,26 @@ async def upload_file(file: UploadFile = File(...)):
     # Read file content
     content = await file.read()
     
-    # Create CSV handler
-    handler = CSVHandler(content, file.filename)
+    # Identical uploads share an ID, so a re-upload reuses the already parsed data
+    file_id = UploadCache.file_id_for(content)
+    # Cache lookups may reload a spilled upload from disk, so keep them off the event loop
+    handler = await asyncio.to_thread(uploaded_files.get, file_id)
     
-    # Validate and parse
-    success, error = handler.parse()
-    if not success:
-        raise HTTPException(status_code=400, detail=error)
-    
-    # Generate file ID
-    file_id = f"file_{len(uploaded_files)}"
-    uploaded_files[file_id] = handler
+    if handler is None:
+        # Create CSV handler
+        handler = CSVHandler(content, file.filename)
+        
+        # Write the raw upload off the event loop, before parsing releases the bytes
+        if PERSIST_UPLOADS:
+            await asyncio.to_thread(handler.persist)
+        
+        # Validate and parse
+        success, error = handler.parse()
+        if not success:
+            raise HTTPException(status_code=400, detail=error)
+        
+        # Storing may spill older uploads to disk
+        await asyncio.to_thread(uploaded_files.put, file_id, handler)
     
     # Get column information
     columns = handler.columns
@@ -135,8 +136,8 @@ async def upload_file(file: UploadFile = File(...)):
     # Validate suggested mappings
     validation = mapping_suggester.validate_mapping(suggested_mappings)
     
-    # Return response: Sanitized JSON to handle NaN and inf values
-    return sanitize_json({
+    # Preview and column info already replace NaN and inf values with None
+    return {
         "file_id": file_id,
         "filename": file.filename,
         "row_count": handler.get_row_count(),
@@ -146,7 +147,7 @@ async def upload_file(file: UploadFile = File(...)):
         "preview": preview,
         "suggested_mappings": suggested_mappings,
         "validation": validation
-    })
+    }
 
 
 @app.post("/api/validate")
@@ -161,43 +162,19 @@ async def validate_mapping(request: ValidateRequest):
         Validation results
     """
     # Get file handler
-    if request.file_id not in uploaded_files:
+    handler = await asyncio.to_thread(uploaded_files.get, request.file_id)
+    if handler is None:
         raise HTTPException(status_code=404, detail="File not found")
     
-    handler = uploaded_files[request.file_id]
-    
     # Validate mapping structure
     validation = mapping_suggester.validate_mapping(request.mapping)
     row_errors = []
     if not validation["errors"]:
         # Validate data against schema
         validator = MappingValidator(request.mapping)
-        total_rows = len(handler.df)
-        batch_size = 10
-        current_row = 0
         
-        # Process rows in batches of 10
-        while current_row < total_rows:
-            batch_data = handler.get_data(skip_rows=current_row, num_rows=batch_size)
-            
-            if not batch_data:  # No more data
-                break
-            
-            for idx, row in enumerate(batch_data):
-                result = validator.validate_row(row)
-                if not result["valid"]:
-                    row_errors.append({
-                        "row": current_row + idx + 1,
-                        "errors": result["errors"]
-                    })
-                    if len(row_errors) >= request.max_error_rows:
-                        break
-            
-            # Break outer loop if max errors reached
-            if len(row_errors) >= request.max_error_rows:
-                break
-            
-            current_row += batch_size
+        # Single vectorized scan; only rows that may be invalid are validated individually
+        row_errors = validator.validate_frame(handler.df, max_errors=request.max_error_rows)
     
     return {
         "valid": len(validation["errors"]) == 0 and len(row_errors) == 0,
@@ -231,7 +208,8 @@ async def save_mapping(request: SaveMappingRequest):
     # The structural validation already passed, so we only keep mapped fields.
     clean_mapping = {k: v for k, v in request.mapping.items() if v is not None and v != ""}
     
-    mapping_id = mapping_storage.save_mapping(
+    mapping_id = await asyncio.to_thread(
+        mapping_storage.save_mapping,
         name=request.name,
         description=request.description,
         mapping=clean_mapping
@@ -244,14 +222,18 @@ async def save_mapping(request: SaveMappingRequest):
 
 
 @app.get("/api/mappings")
-async def list_mappings():
+async def list_mappings(limit: Optional[int] = Query(None, ge=1), offset: int = Query(0, ge=0)):
     """
-    List all saved mapping templates.
+    List saved mapping templates, newest first.
     
+    Args:
+        limit: Maximum number of mappings to return (all if omitted)
+        offset: Number of newest mappings to skip
+        
     Returns:
         List of saved mappings
     """
-    mappings = mapping_storage.list_mappings()
+    mappings = await asyncio.to_thread(mapping_storage.list_mappings, limit=limit, offset=offset)
     return {"mappings": mappings}
 
 
@@ -266,7 +248,7 @@ async def get_mapping(mapping_id: str):
     Returns:
         Mapping details
     """
-    mapping = mapping_storage.get_mapping(mapping_id)
+    mapping = await asyncio.to_thread(mapping_storage.get_mapping, mapping_id)
     if not mapping:
         raise HTTPException(status_code=404, detail="Mapping not found")
     
@@ -284,7 +266,7 @@ async def delete_mapping(mapping_id: str):
     Returns:
         Success message
     """
-    success = mapping_storage.delete_mapping(mapping_id)
+    success = await asyncio.to_thread(mapping_storage.delete_mapping, mapping_id)
     if not success:
         raise HTTPException(status_code=404, detail="Mapping not found")
     
@@ -1,12 +1,13 @@
 """
 Intelligent mapping suggestion engine for CSV columns to schema fields.
 """
-from typing import Dict, List, Optional
-from difflib import SequenceMatcher
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+from rapidfuzz import fuzz, process
 from app import column_classifier
-from app.schema import SCHEMA_FIELDS, get_required_fields
+from app.schema import REQUIRED_FIELDS, SCHEMA_FIELDS, validate_dataframe, validate_record_fields
+import numpy as np
 import pandas as pd
-import re
 from app.column_classifier import ColumnClassifier
 
 class MappingSuggester:
@@ -17,61 +18,126 @@ class MappingSuggester:
     def __init__(self):
         """Initialize the mapping suggester."""
         self.schema_fields = SCHEMA_FIELDS
+        # Lowercased and normalized names per field, built once instead of per comparison
+        self._name_tables = {
+            field: self._build_name_table(field, metadata["aliases"])
+            for field, metadata in SCHEMA_FIELDS.items()
+        }
+        # Every field's normalized names in one flat list for batch scoring, plus
+        # the offset at which each field's names start
+        self._choice_names = [name for table in self._name_tables.values() for name in table[2]]
+        self._choice_starts = np.cumsum([0] + [len(table[2]) for table in self._name_tables.values()])[:-1]
+        # Lowercased field name -> its row, for one-probe exact hits
+        self._lower_to_row = {table[0]: i for i, table in enumerate(self._name_tables.values())}
+        # Lowercased alias -> rows (field positions) it is an alias of, for one-probe alias hits
+        self._alias_rows: Dict[str, List[int]] = {}
+        for i, (_, aliases_lower, _) in enumerate(self._name_tables.values()):
+            for alias in aliases_lower:
+                self._alias_rows.setdefault(alias, []).append(i)
     
-    def _calculate_similarity(self, str1: str, str2: str) -> float:
+    @staticmethod
+    def _normalize(name: str) -> str:
         # Normalize strings: lowercase and remove special characters
-        s1 = str1.lower().replace('_', '').replace('-', '').replace(' ', '')
-        s2 = str2.lower().replace('_', '').replace('-', '').replace(' ', '')
+        return name.lower().replace('_', '').replace('-', '').replace(' ', '')
+    
+    def _build_name_table(self, schema_field: str, aliases: List[str]) -> Tuple[str, Set[str], List[str]]:
+        return (
+            schema_field.lower(),
+            {alias.lower() for alias in aliases},
+            [self._normalize(name) for name in [schema_field, *aliases]]
+        )
+    
+    def _calculate_similarity(self, str1: str, str2: str) -> float:
+        return fuzz.ratio(self._normalize(str1), self._normalize(str2)) / 100.0
+    
+    def _find_best_match(self, csv_column: str, schema_field: str, aliases: Optional[List[str]] = None) -> float:
+        # Use the precomputed table unless a custom alias list is given
+        if aliases is None:
+            name_table = self._name_tables[schema_field]
+        else:
+            name_table = self._build_name_table(schema_field, aliases)
         
-        return SequenceMatcher(None, s1, s2).ratio()
+        return self._score_name(csv_column.lower(), self._normalize(csv_column), name_table)
     
-    def _find_best_match(self, csv_column: str, schema_field: str, aliases: List[str]) -> float:
+    def _score_name(self, csv_lower: str, csv_normalized: str, name_table: Tuple[str, Set[str], List[str]]) -> float:
+        field_lower, aliases_lower, normalized_names = name_table
+        
         # Check exact match first
-        csv_lower = csv_column.lower()
-        if csv_lower == schema_field.lower():
+        if csv_lower == field_lower:
             return 1.0
         
         # Check aliases
-        for alias in aliases:
-            if csv_lower == alias.lower():
-                return 0.95
+        if csv_lower in aliases_lower:
+            return 0.95
+        
+        # Best similarity across the field name and its aliases in a single call
+        _, score, _ = process.extractOne(csv_normalized, normalized_names, scorer=fuzz.ratio)
+        
+        return score / 100.0
+
+    def _name_score_matrix(self, csv_names: List[Tuple[str, str]], score_cutoff: float = 0.0) -> np.ndarray:
+        """
+        Score every schema field's name against every CSV column name at once.
+        
+        Equivalent to _score_name for each pair, but the fuzzy ratios for all
+        names come from a single rapidfuzz cdist call.
+        
+        Args:
+            csv_names: (lowercased, normalized) name of each CSV column
+            score_cutoff: Fuzzy scores below this are reported as 0.0, which lets
+                rapidfuzz reject pairs whose lengths alone rule the cutoff out
+            
+        Returns:
+            Matrix of name scores with a row per schema field and a column per CSV column
+        """
+        tables = list(self._name_tables.values())
+        if not csv_names:
+            return np.zeros((len(tables), 0))
         
-        # Calculate similarity with field name
-        max_similarity = self._calculate_similarity(csv_column, schema_field)
+        # Percent cutoff nudged down so rounding in the conversion never drops a score sitting at the cutoff
+        ratios = process.cdist(self._choice_names, [normalized for _, normalized in csv_names],
+                               scorer=fuzz.ratio, dtype=np.float64,
+                               score_cutoff=max(score_cutoff * 100 - 1e-6, 0.0))
+        # Best ratio over each field's names, as extractOne would find
+        scores = np.maximum.reduceat(ratios, self._choice_starts, axis=0) / 100.0
         
-        # Calculate similarity with aliases
-        for alias in aliases:
-            similarity = self._calculate_similarity(csv_column, alias)
-            max_similarity = max(max_similarity, similarity)
+        # Alias matches override the fuzzy score; exact matches override both
+        for j, (csv_lower, _) in enumerate(csv_names):
+            for i in self._alias_rows.get(csv_lower, ()):
+                scores[i, j] = 0.95
+        for j, (csv_lower, _) in enumerate(csv_names):
+            i = self._lower_to_row.get(csv_lower)
+            if i is not None:
+                scores[i, j] = 1.0
         
-        return max_similarity
+        return scores
 
-    def _content_based_score(self, schema_field: str, series: pd.Series) -> float:
+    def _content_based_score(self, schema_field: str, flags: Dict[str, bool]) -> float:
         score = 0.0
         
         # Assign high score only if the content strongly matches the field type
-        if schema_field == "email" and ColumnClassifier.is_email(series):
+        if schema_field == "email" and flags["email"]:
             score = max(score, 0.95) # Highest priority for email
-        elif schema_field == "phone" and ColumnClassifier.is_phone_number(series):
+        elif schema_field == "phone" and flags["phone"]:
             score = max(score, 0.90) # High priority for phone
-        elif schema_field == "created_at" and ColumnClassifier.is_date(series):
+        elif schema_field == "created_at" and flags["date"]:
             score = max(score, 0.85)  
-        elif schema_field == "age" and ColumnClassifier.is_age(series):
+        elif schema_field == "age" and flags["age"]:
             score = max(score, 0.85)  
-        elif schema_field == "user_id" and ColumnClassifier.is_user_id(series):
+        elif schema_field == "user_id" and flags["user_id"]:
             score = max(score, 0.85)  
-        elif schema_field == "status" and ColumnClassifier.is_status_code(series):
+        elif schema_field == "status" and flags["status"]:
             score = max(score, 0.85) 
         
         # If the field is 'user_id' (string/ID) but the content is a date, reduce the score.
-        if schema_field == "user_id" and ColumnClassifier.is_date(series):
+        if schema_field == "user_id" and flags["date"]:
             score = 0.1 # Low score if it looks like a date
 
         # If the field is 'user_id' (string/ID) but the content is age value, reduce the score.
-        if schema_field == "user_id" and ColumnClassifier.is_age(series):
+        if schema_field == "user_id" and flags["age"]:
             score = 0.1 # Low score if it looks like age
         
-        if schema_field == "phone" and ColumnClassifier.is_date(series):
+        if schema_field == "phone" and flags["date"]:
             score = 0.1 # Low score if it looks like a date
                 
         return score
@@ -80,16 +146,36 @@ class MappingSuggester:
         suggestions = {}
         used_csv_columns = set()
         
+        # Classify each sampled column once; every field's score reuses the flags
+        column_flags = {}
+        if sample_data is not None:
+            column_flags = {
+                csv_col: ColumnClassifier.classify(sample_data[csv_col])
+                for csv_col in csv_columns
+                if csv_col in sample_data.columns
+            }
+        
+        # Lowercase each column once; scoring and the generic-name check reuse it
+        csv_lower = [csv_col.lower() for csv_col in csv_columns]
+        generic = [lower.startswith("column_") for lower in csv_lower]
+        
+        # Name scores for every (schema field, CSV column) pair in one batch
+        schema_fields = list(self.schema_fields)
+        # Name scores below the threshold can never produce a suggestion on their own
+        name_scores = self._name_score_matrix([(lower, self._normalize(lower)) for lower in csv_lower],
+                                              score_cutoff=self.SIMILARITY_THRESHOLD)
+        
         # Combine name-based and content-based scores
-        def get_combined_score(schema_field, csv_col, metadata, sample_data):
-            name_score = self._find_best_match(csv_col, schema_field, metadata["aliases"])
+        def get_combined_score(i, j):
+            schema_field, csv_col = schema_fields[i], csv_columns[j]
+            name_score = name_scores[i, j]
             content_score = 0.0
             
-            if sample_data is not None and csv_col in sample_data.columns:
-                content_score = self._content_based_score(schema_field, sample_data[csv_col])
+            if csv_col in column_flags:
+                content_score = self._content_based_score(schema_field, column_flags[csv_col])
             
             # If the column name is generic (Column_X), rely heavily on content score.
-            if csv_col.lower().startswith("column_"):
+            if generic[j]:
                 return content_score
             
             # For named columns, combine name and content scores
@@ -99,53 +185,31 @@ class MappingSuggester:
             
             return name_score
 
-        # First pass: Find high-confidence matches for required fields
-        for schema_field, metadata in self.schema_fields.items():
-            if not metadata["required"]:
-                continue
-            
-            best_match = None
-            best_score = 0.0
-            
-            for csv_col in csv_columns:
-                if csv_col in used_csv_columns:
-                    continue
-                
-                score = get_combined_score(schema_field, csv_col, metadata, sample_data)
-                
-                if score > best_score:
-                    best_score = score
-                    best_match = csv_col
-            
-            if best_score >= self.SIMILARITY_THRESHOLD:
-                suggestions[schema_field] = best_match
-                used_csv_columns.add(best_match)
-            else:
-                suggestions[schema_field] = None
+        # Score every (schema field, CSV column) pair exactly once
+        scores = np.array(
+            [[get_combined_score(i, j) for j in range(len(csv_columns))] for i in range(len(schema_fields))],
+            dtype=np.float64
+        ).reshape(len(schema_fields), len(csv_columns))
         
-        # Second pass: Find matches for optional fields
-        for schema_field, metadata in self.schema_fields.items():
-            if metadata["required"]:
-                continue
-            
-            best_match = None
-            best_score = 0.0
+        # Required fields are assigned first, then optional fields from the remaining columns
+        for required in (True, False):
+            tier = [i for i, schema_field in enumerate(schema_fields)
+                    if self.schema_fields[schema_field]["required"] is required]
+            tier_scores = scores[tier]
+            tier_scores[:, [j for j, csv_col in enumerate(csv_columns) if csv_col in used_csv_columns]] = -np.inf
             
-            for csv_col in csv_columns:
-                if csv_col in used_csv_columns:
-                    continue
-                
-                score = get_combined_score(schema_field, csv_col, metadata, sample_data)
-                
-                if score > best_score:
-                    best_score = score
-                    best_match = csv_col
+            for i in tier:
+                suggestions[schema_fields[i]] = None
             
-            if best_score >= self.SIMILARITY_THRESHOLD:
-                suggestions[schema_field] = best_match
-                used_csv_columns.add(best_match)
-            else:
-                suggestions[schema_field] = None
+            # Greedily take the highest-scoring remaining pair until none clears the threshold
+            while tier_scores.size:
+                row, col = np.unravel_index(np.argmax(tier_scores), tier_scores.shape)
+                if tier_scores[row, col] < self.SIMILARITY_THRESHOLD:
+                    break
+                suggestions[schema_fields[tier[row]]] = csv_columns[col]
+                used_csv_columns.add(csv_columns[col])
+                tier_scores[row, :] = -np.inf
+                tier_scores[:, col] = -np.inf
         
         return suggestions
     
@@ -153,11 +217,8 @@ class MappingSuggester:
         errors = []
         warnings = []
         
-        # Check that all required fields are mapped
-        required_fields = get_required_fields()
-        for field in required_fields:
-            if field not in mapping or mapping[field] is None or mapping[field] == "":
-                errors.append(f"Required field '{field}' is not mapped")
+        # Check that all required fields are mapped (missing, None and "" all count as unmapped)
+        errors.extend(f"Required field '{field}' is not mapped" for field in REQUIRED_FIELDS if not mapping.get(field))
         
         # Check for duplicate mappings (same CSV column mapped to multiple schema fields)
         csv_columns_used = {}
@@ -177,40 +238,122 @@ class MappingSuggester:
         }
 
 
+@dataclass(slots=True)
+class RowValidationResult:
+    """Outcome of validating one row against the mapped schema."""
+    valid: bool
+    errors: List[str]
+    fields: List[str]  # Failing schema field for each error
+
+
 class MappingValidator:
     """Validates data against mapped schema."""
     
+    CANDIDATE_BATCH_SIZE = 100  # Rows converted per batch when confirming candidates
+    
     def __init__(self, mapping: Dict[str, str]):
         self.mapping = mapping
     
-    def validate_row(self, row: Dict) -> Dict:
-        from app.schema import UserSchema
-        from pydantic import ValidationError
-        
+    def validate_row(self, row: Dict, errors_out: Optional[List[str]] = None) -> RowValidationResult:
         # Map CSV row to schema fields
         mapped_data = {}
         for schema_field, csv_column in self.mapping.items():
             if csv_column and csv_column in row:
-                value = row[csv_column]
-                # Handle empty strings and NaN values
-                if pd.isna(value) or value == "":
-                    mapped_data[schema_field] = None
-                else:
-                    mapped_data[schema_field] = value
+                mapped_data[schema_field] = self._clean_value(row[csv_column])
             else:
                 mapped_data[schema_field] = None
         
-        # Validate against schema
-        try:
-            UserSchema(**mapped_data)
-            return {
-                "valid": True,
-                "errors": []
-            }
-        except ValidationError as e:
-            return {
-                "valid": False,
-                "errors": [f"{err['loc'][0]}: {err['msg']}" for err in e.errors()]
-            }
+        return self._validate_mapped(mapped_data, errors_out)
+    
+    def validate_frame(self, df: pd.DataFrame, max_errors: Optional[int] = None) -> List[Dict]:
+        """
+        Validate every row of a DataFrame against the mapped schema.
+        
+        Rows that column-wise checks prove valid are skipped; only the remaining
+        candidates are run through full schema validation.
+        
+        Args:
+            df: Parsed CSV data
+            max_errors: Stop after this many invalid rows (None for no limit)
+            
+        Returns:
+            List of {"row": 1-based row number, "errors": [...]} for invalid rows
+        """
+        candidates = np.flatnonzero(self._candidate_mask(df))
+        row_errors = []
+        
+        for start in range(0, len(candidates), self.CANDIDATE_BATCH_SIZE):
+            indices = candidates[start:start + self.CANDIDATE_BATCH_SIZE]
+            rows = df.iloc[indices].to_dict(orient='records')
+            for idx, row in zip(indices, rows):
+                result = self.validate_row(row)
+                if not result.valid:
+                    row_errors.append({
+                        "row": int(idx) + 1,
+                        "errors": result.errors
+                    })
+                    if max_errors is not None and len(row_errors) >= max_errors:
+                        return row_errors
+        
+        return row_errors
+    
+    def validate_rows(self, df: pd.DataFrame) -> Tuple[pd.Series, pd.DataFrame]:
+        """
+        Validate every row of a DataFrame, reporting which fields fail.
+        
+        Columns are checked with vectorized operations first; only rows those
+        checks cannot clear are validated one at a time to settle their flags.
+        
+        Args:
+            df: Parsed CSV data
+            
+        Returns:
+            Tuple of (boolean Series, True for valid rows; boolean DataFrame
+            with a column per schema field, True where that field fails)
+        """
+        field_errors = self._column_errors(df)
+        flags = field_errors.to_numpy(copy=True)
+        candidates = np.flatnonzero(flags.any(axis=1))
+        
+        fields = list(field_errors.columns)
+        rows = df.iloc[candidates].to_dict(orient='records')
+        for idx, row in zip(candidates, rows):
+            failed = set(self.validate_row(row).fields)
+            flags[idx] = [field in failed for field in fields]
+        
+        field_errors = pd.DataFrame(flags, index=df.index, columns=fields)
+        return ~field_errors.any(axis=1), field_errors
+    
+    def _column_errors(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Per-field flags for values that may fail validation; unflagged values are guaranteed valid
+        mapped = pd.DataFrame({
+            schema_field: df[csv_column]
+            for schema_field, csv_column in self.mapping.items()
+            if schema_field in SCHEMA_FIELDS and csv_column and csv_column in df.columns
+        }, index=df.index)
+        return validate_dataframe(mapped)
+    
+    def _candidate_mask(self, df: pd.DataFrame) -> np.ndarray:
+        # Flag rows that may fail validation; unflagged rows are guaranteed valid
+        return self._column_errors(df).any(axis=1).to_numpy()
+    
+    @staticmethod
+    def _clean_value(value):
+        # Handle empty strings and NaN values; NaN is the only float unequal to itself.
+        # Direct checks avoid pd.isna's per-scalar dispatch on every cell.
+        if value is None or value is pd.NA or value is pd.NaT:
+            return None
+        if isinstance(value, float) and value != value:
+            return None
+        if isinstance(value, str) and value == "":
+            return None
+        return value
+    
+    def _validate_mapped(self, mapped_data: Dict, errors_out: Optional[List[str]] = None) -> RowValidationResult:
+        # Validate against schema; callers collecting errors across rows can pass errors_out
+        _, errors, fields = validate_record_fields(mapped_data)
+        if errors_out is not None:
+            errors_out.extend(errors)
+        return RowValidationResult(valid=not errors, errors=errors, fields=fields)
 
 import pandas as pd
@@ -1,15 +1,133 @@
 """
 Storage and retrieval of reusable mapping templates.
 """
+import bisect
+import copy
 import json
+import mmap
 import os
-from typing import Dict, List, Optional
-from datetime import datetime
-import hashlib
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+import secrets
+import tempfile
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib json fallback
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no cross-process locking on Windows
+    fcntl = None
+
+# Files at least this large are parsed straight from a memory map (orjson only);
+# below it, mmap setup costs more than the copy it saves
+_MMAP_MIN_BYTES = 256 * 1024
+
+# Parsed mapping files kept per storage instance for repeat get_mapping calls
+_MAPPING_CACHE_SIZE = 128
+
+# IDs come from clients, so only generated IDs may ever reach a mapping file path;
+# this also keeps the reserved _index.json out of reach
+_MAPPING_ID_RE = re.compile(r"[0-9a-f]{12}")
+
+# Storage directories already created in this process (absolute paths)
+_INITIALIZED_DIRS = set()
+_INIT_LOCK = threading.Lock()
+
+# Locks per storage directory (absolute path), shared by all instances. Instances look
+# them up on every use instead of keeping a reference, so the fork hook can replace them.
+# Index locks serialize index read-modify-write cycles and are held while waiting on
+# another process's flock; cache locks only guard the parsed-mapping LRUs, so cache
+# hits never wait on index writes.
+_INDEX_LOCKS: Dict[str, threading.Lock] = {}
+_CACHE_LOCKS: Dict[str, threading.Lock] = {}
+# Directory descriptors currently holding an flock in this process
+_LOCKED_FDS = set()
+
+
+def _reset_locks_after_fork() -> None:
+    # A forked child inherits locks held by parent threads that don't exist in it.
+    # Its copies of flocked descriptors would also keep the parent's flock alive.
+    global _INIT_LOCK
+    _INIT_LOCK = threading.Lock()
+    for fd in _LOCKED_FDS:
+        os.close(fd)
+    _LOCKED_FDS.clear()
+    _INDEX_LOCKS.clear()
+    _CACHE_LOCKS.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+def _dir_lock(locks: Dict[str, threading.Lock], abs_dir: str) -> threading.Lock:
+    """Return the lock for a storage directory, creating it on first use."""
+    lock = locks.get(abs_dir)
+    if lock is None:
+        lock = locks.setdefault(abs_dir, threading.Lock())
+    return lock
+
+
+def _file_key(st: os.stat_result) -> Tuple[int, int, int]:
+    """Identify a file version; every write replaces the file, so the inode changes too."""
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _read_json(path: str) -> Any:
+    """Parse a JSON file, using orjson when it is installed."""
+    with open(path, 'rb') as f:
+        if orjson is not None and os.fstat(f.fileno()).st_size >= _MMAP_MIN_BYTES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    return orjson.loads(view)
+        content = f.read()
+    return orjson.loads(content) if orjson is not None else json.loads(content)
+
+
+def _atomic_write(path: str, content: bytes) -> None:
+    """Write a file via a temporary sibling and a rename, so readers never see a partial file."""
+    # A unique temporary name, so concurrent writers of the same path never share one
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory or ".")
+    try:
+        # mkstemp creates owner-only files; keep the usual permissions for mapping files
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_json(path: str, data: Any) -> None:
+    """Serialize data to a compact JSON file, using orjson when it is installed."""
+    # Compact output: with indent set, the stdlib falls back to its pure-Python encoder
+    content = orjson.dumps(data) if orjson is not None else json.dumps(data).encode()
+    _atomic_write(path, content)
+
+
+def _copy_mapping(mapping_data: Any) -> Any:
+    """Copy a cached mapping record so callers cannot modify the cache."""
+    if isinstance(mapping_data, dict) and isinstance(mapping_data.get("mapping"), dict):
+        # Records hold flat string values apart from the mapping itself
+        return {**mapping_data, "mapping": dict(mapping_data["mapping"])}
+    return copy.deepcopy(mapping_data)
+
 
 class MappingStorage:
     """Handles saving and loading of mapping templates."""
     
+    __slots__ = ("storage_dir", "_abs_dir", "_index_path", "_cache", "_mappings")
+    
     def __init__(self, storage_dir: str = "mappings"):
         """
         Initialize mapping storage.
@@ -18,21 +136,173 @@ class MappingStorage:
             storage_dir: Directory to store mapping files
         """
         self.storage_dir = storage_dir
-        os.makedirs(storage_dir, exist_ok=True)
+        # Listing metadata for every mapping, newest first
+        self._index_path = os.path.join(storage_dir, "_index.json")
+        # Parsed index, reused while the index file is unchanged
+        self._cache: Optional[Tuple[Tuple[int, int, int], List[Dict]]] = None
+        # Recently read mapping files as (file key, data), least recently used first
+        self._mappings: "OrderedDict[str, Tuple[Tuple[int, int, int], Any]]" = OrderedDict()
+        
+        # Keys the directory's shared locks
+        self._abs_dir = os.path.abspath(storage_dir)
+        
+        # Only the first instance per directory pays for the makedirs call
+        if self._abs_dir not in _INITIALIZED_DIRS:
+            with _INIT_LOCK:
+                if self._abs_dir not in _INITIALIZED_DIRS:
+                    os.makedirs(self._abs_dir, exist_ok=True)
+                    _INITIALIZED_DIRS.add(self._abs_dir)
+    
+    @property
+    def _cache_lock(self) -> threading.Lock:
+        return _dir_lock(_CACHE_LOCKS, self._abs_dir)
     
-    def _generate_mapping_id(self, name: str) -> str:
+    @staticmethod
+    def _metadata(mapping_data: Dict) -> Dict:
+        return {
+            "id": mapping_data["id"],
+            "name": mapping_data["name"],
+            "description": mapping_data["description"],
+            "created_at": mapping_data["created_at"]
+        }
+    
+    def _scan_mappings(self) -> List[Dict]:
         """
-        Generate a unique ID for a mapping.
+        Rebuild the listing metadata by reading every mapping file.
+        
+        Returns:
+            Mapping metadata sorted by creation date (newest first)
+        """
+        rows = []
+        with os.scandir(self.storage_dir) as entries:
+            for entry in entries:
+                # DirEntry caches its type from the directory listing, so no extra stat
+                if not entry.name.endswith('.json') or entry.path == self._index_path or not entry.is_file():
+                    continue
+                try:
+                    rows.append(self._metadata(_read_json(entry.path)))
+                except Exception:
+                    continue
+        
+        rows.sort(key=lambda x: x["created_at"], reverse=True)
+        return rows
+    
+    @contextmanager
+    def _locked_index(self):
+        """Hold the directory's index lock against other threads and, via flock, other processes."""
+        with _dir_lock(_INDEX_LOCKS, self._abs_dir):
+            if fcntl is None:
+                yield
+                return
+            # Lock the directory itself, so no extra lock file shows up next to the mappings
+            fd = os.open(self.storage_dir, os.O_RDONLY)
+            _LOCKED_FDS.add(fd)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                # Closing the descriptor releases the flock
+                _LOCKED_FDS.discard(fd)
+                os.close(fd)
+    
+    def _read_index(self, use_cache: bool = True) -> Optional[List[Dict]]:
+        """
+        Read the listing index.
         
         Args:
-            name: Mapping name
+            use_cache: Reuse the parsed index while the file is unchanged
             
         Returns:
-            Unique mapping ID
+            Mapping metadata sorted by creation date (newest first), or None if
+            the index is missing or unreadable
         """
-        timestamp = datetime.now().isoformat()
-        hash_input = f"{name}_{timestamp}".encode()
-        return hashlib.md5(hash_input).hexdigest()[:12]
+        try:
+            key = _file_key(os.stat(self._index_path))
+            if use_cache and self._cache is not None and self._cache[0] == key:
+                return self._cache[1]
+            rows = _read_json(self._index_path)
+        except Exception:
+            return None
+        self._cache = (key, rows)
+        return rows
+    
+    def _current_index(self) -> List[Dict]:
+        """
+        Read the index from disk, rebuilding it from the mapping files if needed.
+        
+        Must be called while holding _locked_index, so no other writer can
+        update the index between this read and the caller's write.
+        
+        Returns:
+            Mapping metadata sorted by creation date (newest first)
+        """
+        rows = self._read_index(use_cache=False)
+        if rows is None:
+            # No (or unreadable) index yet: directories written before the index existed
+            rows = self._scan_mappings()
+            self._write_index(rows)
+        return rows
+    
+    def _write_index(self, rows: List[Dict]) -> None:
+        """
+        Atomically replace the listing index.
+        
+        Args:
+            rows: Mapping metadata sorted by creation date (newest first)
+        """
+        _write_json(self._index_path, rows)
+        self._cache = (_file_key(os.stat(self._index_path)), rows)
+    
+    def _put_index_rows(self, metadata_rows: List[Dict]) -> None:
+        """
+        Add or replace mappings' rows in the index with a single index write.
+        
+        Args:
+            metadata_rows: Listing metadata of the mappings
+        """
+        ids = {metadata["id"] for metadata in metadata_rows}
+        with self._locked_index():
+            rows = [row for row in self._current_index() if row["id"] not in ids]
+            # Rows are kept newest first, so insert by position in the reversed key order
+            keys = [row["created_at"] for row in reversed(rows)]
+            for metadata in metadata_rows:
+                position = bisect.bisect_right(keys, metadata["created_at"])
+                keys.insert(position, metadata["created_at"])
+                rows.insert(len(rows) - position, metadata)
+            self._write_index(rows)
+    
+    def _drop_index_row(self, mapping_id: str) -> None:
+        """
+        Remove a mapping's row from the index.
+        
+        Args:
+            mapping_id: ID of the mapping
+        """
+        with self._locked_index():
+            self._write_index([row for row in self._current_index() if row["id"] != mapping_id])
+    
+    def _mapping_path(self, mapping_id: str) -> Optional[str]:
+        """
+        Build the file path for a mapping ID.
+        
+        Args:
+            mapping_id: ID of the mapping
+            
+        Returns:
+            Path of the mapping file, or None if the ID is not a valid mapping ID
+        """
+        if not isinstance(mapping_id, str) or not _MAPPING_ID_RE.fullmatch(mapping_id):
+            return None
+        return os.path.join(self.storage_dir, f"{mapping_id}.json")
+    
+    def _generate_mapping_id(self) -> str:
+        """
+        Generate a unique ID for a mapping.
+        
+        Returns:
+            Random 12-character hex mapping ID
+        """
+        return secrets.token_hex(6)
     
     def save_mapping(self, name: str, description: str, mapping: Dict[str, str]) -> str:
         """
@@ -46,22 +316,41 @@ class MappingStorage:
         Returns:
             ID of the saved mapping
         """
-        mapping_id = self._generate_mapping_id(name)
-        
-        mapping_data = {
-            "id": mapping_id,
-            "name": name,
-            "description": description,
-            "mapping": mapping,
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat()
-        }
+        return self.save_many([{"name": name, "description": description, "mapping": mapping}])[0]
+    
+    def save_many(self, templates: List[Dict]) -> List[str]:
+        """
+        Save several mapping templates, updating the listing index once.
         
-        filepath = os.path.join(self.storage_dir, f"{mapping_id}.json")
-        with open(filepath, 'w') as f:
-            json.dump(mapping_data, f, indent=2)
+        Args:
+            templates: Dictionaries with name, description and mapping keys
+            
+        Returns:
+            IDs of the saved mappings, in input order
+        """
+        # Build every record up front, so a malformed template fails before anything is written
+        records = []
+        for template in templates:
+            now = datetime.now(timezone.utc).isoformat()
+            records.append({
+                "id": self._generate_mapping_id(),
+                "name": template["name"],
+                "description": template["description"],
+                "mapping": template["mapping"],
+                "created_at": now,
+                "updated_at": now
+            })
         
-        return mapping_id
+        metadata_rows = []
+        try:
+            for mapping_data in records:
+                _write_json(self._mapping_path(mapping_data["id"]), mapping_data)
+                metadata_rows.append(self._metadata(mapping_data))
+        finally:
+            # Index whatever reached disk, even if a later write failed
+            if metadata_rows:
+                self._put_index_rows(metadata_rows)
+        return [mapping_data["id"] for mapping_data in records]
     
     def get_mapping(self, mapping_id: str) -> Optional[Dict]:
         """
@@ -73,48 +362,51 @@ class MappingStorage:
         Returns:
             Mapping data or None if not found
         """
-        filepath = os.path.join(self.storage_dir, f"{mapping_id}.json")
-        
-        if not os.path.exists(filepath):
+        filepath = self._mapping_path(mapping_id)
+        if filepath is None:
             return None
         
+        # A missing file raises FileNotFoundError, so no separate existence check
         try:
-            with open(filepath, 'r') as f:
-                return json.load(f)
+            key = _file_key(os.stat(filepath))
+            with self._cache_lock:
+                cached = self._mappings.get(mapping_id)
+                # Checking the file key keeps writes from other instances visible
+                if cached is not None and cached[0] == key:
+                    self._mappings.move_to_end(mapping_id)
+                    return _copy_mapping(cached[1])
+            mapping_data = _read_json(filepath)
         except Exception:
             return None
+        
+        with self._cache_lock:
+            self._mappings[mapping_id] = (key, mapping_data)
+            self._mappings.move_to_end(mapping_id)
+            if len(self._mappings) > _MAPPING_CACHE_SIZE:
+                self._mappings.popitem(last=False)
+        return _copy_mapping(mapping_data)
     
-    def list_mappings(self) -> List[Dict]:
+    def list_mappings(self, *, limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
         """
-        List all saved mappings.
+        List saved mappings, newest first.
         
+        Args:
+            limit: Maximum number of mappings to return (None for all)
+            offset: Number of newest mappings to skip
+            
         Returns:
             List of mapping metadata (without full mapping details)
         """
-        mappings = []
-        
         if not os.path.exists(self.storage_dir):
-            return mappings
-        
-        for filename in os.listdir(self.storage_dir):
-            if filename.endswith('.json'):
-                filepath = os.path.join(self.storage_dir, filename)
-                try:
-                    with open(filepath, 'r') as f:
-                        data = json.load(f)
-                        mappings.append({
-                            "id": data["id"],
-                            "name": data["name"],
-                            "description": data["description"],
-                            "created_at": data["created_at"]
-                        })
-                except Exception:
-                    continue
+            return []
         
-        # Sort by creation date (newest first)
-        mappings.sort(key=lambda x: x["created_at"], reverse=True)
-        
-        return mappings
+        rows = self._read_index()
+        if rows is None:
+            with self._locked_index():
+                rows = self._current_index()
+        # The index is kept sorted, so a page is a plain slice
+        end = None if limit is None else offset + limit
+        return [dict(row) for row in rows[offset:end]]
     
     def delete_mapping(self, mapping_id: str) -> bool:
         """
@@ -126,16 +418,20 @@ class MappingStorage:
         Returns:
             True if deleted, False if not found
         """
-        filepath = os.path.join(self.storage_dir, f"{mapping_id}.json")
-        
-        if not os.path.exists(filepath):
+        filepath = self._mapping_path(mapping_id)
+        if filepath is None:
             return False
         
+        # Missing files raise FileNotFoundError, so no separate existence check
         try:
             os.remove(filepath)
-            return True
-        except Exception:
+        except OSError:
             return False
+        
+        with self._cache_lock:
+            self._mappings.pop(mapping_id, None)
+        self._drop_index_row(mapping_id)
+        return True
     
     def update_mapping(self, mapping_id: str, name: str, description: str, mapping: Dict[str, str]) -> bool:
         """
@@ -160,11 +456,14 @@ class MappingStorage:
             "description": description,
             "mapping": mapping,
             "created_at": existing["created_at"],
-            "updated_at": datetime.now().isoformat()
+            "updated_at": datetime.now(timezone.utc).isoformat()
         }
         
-        filepath = os.path.join(self.storage_dir, f"{mapping_id}.json")
-        with open(filepath, 'w') as f:
-            json.dump(mapping_data, f, indent=2)
+        # get_mapping already rejected invalid IDs
+        _write_json(self._mapping_path(mapping_id), mapping_data)
+        with self._cache_lock:
+            self._mappings.pop(mapping_id, None)
+        
+        self._put_index_rows([self._metadata(mapping_data)])
         
         return True
@@ -1,11 +1,39 @@
 """
 Predefined schema definition for CSV mapping validation.
 """
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
 from typing import Optional, Literal
 from datetime import datetime
 import re
 
+import numpy as np
+import pandas as pd
+
+# Separators ignored when counting phone digits
+_PHONE_SEPARATORS = str.maketrans("", "", " -.()")
+
+
+def _valid_phone(phone: str) -> bool:
+    """
+    Check a phone number by its digits: an optional leading '+' and 7-15 digits.
+
+    Separators (spaces, dashes, dots, parentheses) are ignored, so
+    +44 1234567890, (123) 456-7890, 123-456-7890, etc. are all accepted.
+    """
+    digits = phone.translate(_PHONE_SEPARATORS)
+    if digits.startswith("+"):
+        digits = digits[1:]
+    return 7 <= len(digits) <= 15 and digits.isascii() and digits.isdigit()
+
+
+_ALLOWED_STATUSES = frozenset({"active", "inactive", "pending"})
+_ALLOWED_STATUSES_MSG = f'Status must be one of: {", ".join(sorted(_ALLOWED_STATUSES))}'
+
+# Vectorized form of _valid_phone, applied after the separators are removed
+_PHONE_SEP_RE = re.compile(r"[ \-.()]")
+_PHONE_DIGITS_RE = re.compile(r"\+?[0-9]{7,15}")
+
+
 class UserSchema(BaseModel):
     """
     Predefined schema that CSV data must be mapped to.
@@ -24,51 +52,51 @@ class UserSchema(BaseModel):
     status: Optional[str] = Field(None, description="User account status (active/inactive/pending)")
     created_at: Optional[str] = Field(None, description="Account creation date")
     
-    @validator('phone', pre=True)
+    @field_validator('phone', mode='before')
+    @classmethod
     def validate_phone(cls, v):
-        """Validate phone number format using regex."""
+        """Validate phone number format by counting digits."""
         if v is None:
             return v
 
         phone_str = str(v).strip()
-        # Example: allows +44 1234567890, (123) 456-7890, 123-456-7890, etc.
-        pattern = re.compile(r"^\+?\d{1,4}?[\s\-\.]?\(?\d{1,4}?\)?[\s\-\.]?\d{1,4}[\s\-\.]?\d{1,9}$")
-
-        if not pattern.match(phone_str):
+        if not _valid_phone(phone_str):
             raise ValueError("Invalid phone number format")
 
         return phone_str
 
-    @validator('status', pre=True)
+    @field_validator('status', mode='before')
+    @classmethod
     def validate_status(cls, v):
         """Validate status against allowed values, case-insensitively."""
         if v is None:
             return v
         
-        allowed_statuses = ["active", "inactive", "pending"]
-        v_lower = str(v).lower()
+        v_lower = v.lower() if isinstance(v, str) else str(v).lower()
         
-        if v_lower not in allowed_statuses:
-            raise ValueError(f'Status must be one of: {", ".join(allowed_statuses)}')
+        if v_lower not in _ALLOWED_STATUSES:
+            raise ValueError(_ALLOWED_STATUSES_MSG)
         
         return v_lower
 
-    @validator('email')
+    @field_validator('email')
+    @classmethod
     def validate_email(cls, v):
         """Validate email format."""
         if '@' not in v:
             raise ValueError('Invalid email format')
         return v.lower()
     
-    @validator('user_id')
+    @field_validator('user_id')
+    @classmethod
     def validate_user_id(cls, v):
         """Ensure user_id is not empty."""
         if not v or not v.strip():
             raise ValueError('user_id cannot be empty')
         return v.strip()
     
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "user_id": "USR001",
                 "email": "john.doe@example.com",
@@ -81,6 +109,7 @@ class UserSchema(BaseModel):
                 "created_at": "2024-01-01"
             }
         }
+    )
 
 
 # Schema metadata for UI and mapping suggestions
@@ -142,11 +171,239 @@ SCHEMA_FIELDS = {
 }
 
 
+# Required field names in schema order, computed once at import
+REQUIRED_FIELDS = tuple(field for field, meta in SCHEMA_FIELDS.items() if meta["required"])
+
+
 def get_required_fields():
     """Return list of required field names."""
-    return [field for field, meta in SCHEMA_FIELDS.items() if meta["required"]]
+    return list(REQUIRED_FIELDS)
 
 
 def get_all_fields():
     """Return list of all field names."""
     return list(SCHEMA_FIELDS.keys())
+
+
+# Field name or alias -> schema field, built once from SCHEMA_FIELDS
+_ALIAS_TO_FIELD = {
+    alias: field
+    for field, meta in SCHEMA_FIELDS.items()
+    for alias in (*meta["aliases"], field)
+}
+
+
+def field_for_alias(name: str) -> Optional[str]:
+    """Return the schema field a column name or alias refers to, or None."""
+    return _ALIAS_TO_FIELD.get(name.strip().lower().replace(" ", "_"))
+
+
+def _string_values(series: pd.Series) -> tuple:
+    """Split a column into a mask of str values and a text series safe for .str methods."""
+    # Non-string values (e.g. numeric columns) fail the schema's str type
+    if pd.api.types.infer_dtype(series, skipna=True) == "string":
+        is_str = ~series.isna().to_numpy()
+    else:
+        is_str = np.fromiter((isinstance(value, str) for value in series), dtype=bool, count=len(series))
+    return is_str, series.where(is_str, "").astype(object)
+
+
+def _valid_values(field: str, series: pd.Series) -> np.ndarray:
+    """Mask of non-null values of one schema field that UserSchema is certain to accept."""
+    if field == "age":
+        # Only plain numeric columns can be cleared here; anything else goes to the schema
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            numeric = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            # numeric % 1 would warn on inf, so check finiteness before integrality
+            return np.isfinite(numeric) & (np.floor(numeric) == numeric) & (numeric >= 0) & (numeric <= 150)
+        return np.zeros(len(series), dtype=bool)
+    
+    ok, text = _string_values(series)
+    if field == "email":
+        ok &= text.str.contains("@", regex=False).to_numpy(dtype=bool)
+    elif field == "user_id":
+        ok &= (text.str.strip() != "").to_numpy()
+    elif field == "phone":
+        digits = text.str.strip().str.replace(_PHONE_SEP_RE, "", regex=True)
+        ok &= digits.str.fullmatch(_PHONE_DIGITS_RE).to_numpy(dtype=bool)
+    elif field == "status":
+        ok &= text.str.lower().isin(_ALLOWED_STATUSES).to_numpy()
+    return ok
+
+
+def validate_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Check whole columns against UserSchema's rules with vectorized pandas operations.
+    
+    Empty strings and NaN count as missing, as they do when rows are validated
+    one at a time. Values the vectorized checks cannot vouch for (such as
+    non-numeric text in an age column) are flagged too, so every unflagged
+    row is guaranteed to pass UserSchema; run flagged rows through UserSchema
+    for the exact error messages.
+    
+    Args:
+        df: Data with one column per schema field
+        
+    Returns:
+        Boolean DataFrame with a column per schema field, True where a value fails
+    """
+    errors = {}
+    for field, metadata in SCHEMA_FIELDS.items():
+        if field not in df.columns:
+            errors[field] = np.full(len(df), metadata["required"])
+            continue
+        
+        series = df[field]
+        is_null = (series.isna() | (series == "")).to_numpy()
+        valid = _valid_values(field, series)
+        if metadata["required"]:
+            errors[field] = ~(valid & ~is_null)
+        else:
+            errors[field] = ~(valid | is_null)
+    
+    return pd.DataFrame(errors, index=df.index)
+
+
+class _Unsupported(Exception):
+    """Raised by the generated validator for values only UserSchema can judge."""
+
+
+def _unsupported():
+    raise _Unsupported
+
+
+# Generated checks per field, mirroring UserSchema's types, constraints and
+# validators (and pydantic's error messages). `v` is the input value; each
+# snippet stores the cleaned value in `out` or appends a (field, message) error.
+_STR_CHECK = """
+if type(v) is str:
+    {clean}
+elif v is None or type(v) in (int, float, bool):
+    errors.append(("{field}", "Input should be a valid string"))
+else:
+    _unsupported()
+"""
+
+_FIELD_CHECKS = {
+    "user_id": _STR_CHECK.format(field="user_id", clean="""
+    if not v.strip():
+        errors.append(("user_id", "Value error, user_id cannot be empty"))
+    else:
+        out["user_id"] = v.strip()"""),
+    "email": _STR_CHECK.format(field="email", clean="""
+    if "@" not in v:
+        errors.append(("email", "Value error, Invalid email format"))
+    else:
+        out["email"] = v.lower()"""),
+    "age": """
+if type(v) is float:
+    if v != v or v in (_INF, -_INF):
+        errors.append(("age", "Input should be a finite number"))
+        v = None
+    elif not v.is_integer():
+        errors.append(("age", "Input should be a valid integer, got a number with a fractional part"))
+        v = None
+    elif abs(v) >= 2.0 ** 63:
+        # pydantic reports floats beyond int64 differently
+        _unsupported()
+elif type(v) is not int and type(v) is not bool:
+    _unsupported()
+if v is not None:
+    if v < 0:
+        errors.append(("age", "Input should be greater than or equal to 0"))
+    elif v > 150:
+        errors.append(("age", "Input should be less than or equal to 150"))
+    else:
+        out["age"] = int(v)
+""",
+    "phone": """
+phone = str(v).strip()
+if not _valid_phone(phone):
+    errors.append(("phone", "Value error, Invalid phone number format"))
+else:
+    out["phone"] = phone
+""",
+    "status": """
+status = v.lower() if type(v) is str else str(v).lower()
+if status not in _ALLOWED_STATUSES:
+    errors.append(("status", "Value error, " + _ALLOWED_STATUSES_MSG))
+else:
+    out["status"] = status
+""",
+}
+
+
+def _generate_record_validator() -> str:
+    """Emit the source of a validator with every field's checks inlined, in schema order."""
+    lines = ["def _validate_record(d):", "    out = {}", "    errors = []"]
+    for field, metadata in SCHEMA_FIELDS.items():
+        check = _FIELD_CHECKS.get(field, _STR_CHECK.format(field=field, clean=f'out["{field}"] = v'))
+        lines.append(f'    if "{field}" in d:')
+        lines.append(f'        v = d["{field}"]')
+        if not metadata["required"]:
+            # Optional fields accept None before any validator runs
+            lines.append("        if v is None:")
+            lines.append(f'            out["{field}"] = None')
+            lines.append("        else:")
+            indent = " " * 12
+        else:
+            indent = " " * 8
+        lines.extend(indent + line for line in check.splitlines() if line.strip())
+        lines.append("    else:")
+        if metadata["required"]:
+            lines.append(f'        errors.append(("{field}", "Field required"))')
+        else:
+            lines.append(f'        out["{field}"] = None')
+    lines.append("    return (None if errors else out), errors")
+    return "\n".join(lines) + "\n"
+
+
+_namespace = {
+    "_unsupported": _unsupported,
+    "_valid_phone": _valid_phone,
+    "_ALLOWED_STATUSES": _ALLOWED_STATUSES,
+    "_ALLOWED_STATUSES_MSG": _ALLOWED_STATUSES_MSG,
+    "_INF": float("inf"),
+}
+exec(compile(_generate_record_validator(), "<schema validate_record>", "exec"), _namespace)
+_validate_record = _namespace["_validate_record"]
+
+
+def validate_record_fields(data: dict) -> tuple:
+    """
+    Validate one record against UserSchema without constructing a model.
+    
+    Runs a validator generated from SCHEMA_FIELDS with every field's checks
+    inlined. Values it does not handle natively (e.g. numeric strings for age)
+    are handed to UserSchema, so results always agree with the model.
+    
+    Args:
+        data: Record keyed by schema field; unknown keys are ignored
+        
+    Returns:
+        Tuple of (cleaned record or None if invalid, list of "field: message"
+        errors, list of the failing field name for each error)
+    """
+    try:
+        cleaned, failures = _validate_record(data)
+    except _Unsupported:
+        try:
+            cleaned, failures = UserSchema(**data).model_dump(), []
+        except ValidationError as e:
+            cleaned, failures = None, [(err['loc'][0], err['msg']) for err in e.errors()]
+    
+    return cleaned, [f"{field}: {message}" for field, message in failures], [field for field, _ in failures]
+
+
+def validate_record(data: dict) -> tuple:
+    """
+    Validate one record against UserSchema without constructing a model.
+    
+    Args:
+        data: Record keyed by schema field; unknown keys are ignored
+        
+    Returns:
+        Tuple of (cleaned record or None if invalid, list of "field: message" errors)
+    """
+    cleaned, errors, _ = validate_record_fields(data)
+    return cleaned, errors
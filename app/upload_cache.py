@@ -0,0 +1,237 @@
+"""
+Bounded cache of parsed uploads with on-disk spill for evicted entries.
+"""
+import atexit
+import hashlib
+import hmac
+import os
+import pickle
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from app.csv_handler import CSVHandler
+
+# IDs come from clients, so only generated IDs may ever reach a spill file path
+_FILE_ID_RE = re.compile(r"file_[0-9a-f]{16}")
+
+# Spill files start with an HMAC-SHA256 of the pickled bytes that follow
+_DIGEST_SIZE = hashlib.sha256().digest_size
+
+# Rows sampled per object column when estimating a DataFrame's memory use
+_SIZE_SAMPLE_ROWS = 1000
+
+
+def _estimate_memory(df: Optional[pd.DataFrame]) -> int:
+    """
+    Estimate a DataFrame's deep memory use without scanning every object value.
+
+    Fixed-width columns are measured exactly; the per-value overhead of object
+    columns is extrapolated from randomly sampled rows.
+
+    Args:
+        df: DataFrame to measure (None counts as empty)
+
+    Returns:
+        Estimated size in bytes
+    """
+    if df is None:
+        return 0
+    rows = len(df)
+    if rows <= _SIZE_SAMPLE_ROWS:
+        return int(df.memory_usage(deep=True).sum())
+
+    # A fixed seed keeps the estimate for the same upload stable across calls
+    positions = np.random.default_rng(0).integers(0, rows, _SIZE_SAMPLE_ROWS)
+    sample = df.iloc[positions]
+    object_overhead = sample.memory_usage(deep=True, index=False) - sample.memory_usage(index=False)
+    return int(df.memory_usage().sum() + object_overhead.sum() * rows / len(sample))
+
+
+class UploadCache:
+    """Keeps recently used parsed uploads in memory and spills older ones to disk."""
+
+    MAX_MEMORY_BYTES = 512 * 1024 * 1024  # 512 MB of parsed DataFrames
+    MAX_SPILL_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB of spill files; the oldest are pruned beyond this
+
+    def __init__(self, cache_dir: Optional[str] = None, max_memory_bytes: Optional[int] = None,
+                 max_spill_bytes: Optional[int] = None):
+        """
+        Initialize the upload cache.
+
+        Spill files are pickles, so each is signed with a key that only this
+        process holds and is unpickled only if the signature matches. Spill
+        files already in cache_dir (e.g. from an earlier run) cannot be verified
+        and are deleted.
+
+        Args:
+            cache_dir: Directory for handlers evicted from memory (defaults to a
+                private temporary directory, removed at exit)
+            max_memory_bytes: Memory budget for cached DataFrames (defaults to MAX_MEMORY_BYTES)
+            max_spill_bytes: Disk budget for spill files (defaults to MAX_SPILL_BYTES)
+        """
+        if cache_dir is None:
+            cache_dir = tempfile.mkdtemp(prefix="csv-mapper-spill-")
+            atexit.register(shutil.rmtree, cache_dir, ignore_errors=True)
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes if max_memory_bytes is not None else self.MAX_MEMORY_BYTES
+        self.max_spill_bytes = max_spill_bytes if max_spill_bytes is not None else self.MAX_SPILL_BYTES
+        self._handlers: "OrderedDict[str, CSVHandler]" = OrderedDict()
+        self._sizes: dict = {}
+        self._memory_bytes = 0
+        # Spill files as file ID -> (file bytes, estimated DataFrame bytes), oldest first
+        self._spilled: "OrderedDict[str, tuple]" = OrderedDict()
+        self._spill_bytes = 0
+        # Request handlers call the cache from worker threads; spill I/O runs under
+        # the lock too, so an entry is always either in memory or on disk
+        self._lock = threading.Lock()
+        self._key = secrets.token_bytes(32)
+        self._remove_stale_spills()
+
+    @staticmethod
+    def file_id_for(content: bytes) -> str:
+        """
+        Derive a stable file ID from the uploaded bytes.
+
+        Args:
+            content: Raw file content
+
+        Returns:
+            File ID shared by identical uploads
+        """
+        return f"file_{hashlib.blake2b(content, digest_size=8).hexdigest()}"
+
+    def _spill_path(self, file_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{file_id}.pkl")
+
+    def _remove_stale_spills(self) -> None:
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir)
+                       if entry.name.endswith(".pkl") and _FILE_ID_RE.fullmatch(entry.name[:-4])]
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def _sign(self, data: bytes) -> bytes:
+        return hmac.new(self._key, data, hashlib.sha256).digest()
+
+    def _write_spill(self, spill_path: str, handler: CSVHandler) -> None:
+        data = pickle.dumps(handler, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(spill_path, "wb") as f:
+            f.write(self._sign(data))
+            f.write(data)
+
+    def _read_spill(self, spill_path: str) -> Optional[CSVHandler]:
+        try:
+            with open(spill_path, "rb") as f:
+                blob = f.read()
+        except OSError:
+            return None
+        data = blob[_DIGEST_SIZE:]
+        # Anything this process did not write itself is never unpickled
+        if not hmac.compare_digest(blob[:_DIGEST_SIZE], self._sign(data)):
+            return None
+        try:
+            handler = pickle.loads(data)
+        except Exception:
+            return None
+        return handler if isinstance(handler, CSVHandler) else None
+
+    def __contains__(self, file_id: str) -> bool:
+        with self._lock:
+            return file_id in self._handlers or file_id in self._spilled
+
+    def __len__(self) -> int:
+        return len(self._handlers)
+
+    def put(self, file_id: str, handler: CSVHandler) -> None:
+        """
+        Add a parsed handler, evicting least recently used entries over budget.
+
+        Spilling evicted entries writes to disk, so call this off the event loop.
+
+        Args:
+            file_id: ID of the upload
+            handler: Parsed CSV handler
+        """
+        size = _estimate_memory(handler.df)
+        with self._lock:
+            self._insert(file_id, handler, size)
+
+    def get(self, file_id: str) -> Optional[CSVHandler]:
+        """
+        Retrieve a handler, reloading it from disk if it was evicted.
+
+        Reloading reads from disk, so call this off the event loop.
+
+        Args:
+            file_id: ID of the upload
+
+        Returns:
+            The handler, or None if the ID is unknown or its spill file is unreadable or unsigned
+        """
+        with self._lock:
+            handler = self._handlers.get(file_id)
+            if handler is not None:
+                self._handlers.move_to_end(file_id)
+                return handler
+
+            spilled = self._spilled.pop(file_id, None)
+            if spilled is None:
+                return None
+            self._spill_bytes -= spilled[0]
+            spill_path = self._spill_path(file_id)
+            # Missing, truncated or tampered files are dropped as a miss
+            handler = self._read_spill(spill_path)
+            if os.path.exists(spill_path):
+                os.remove(spill_path)
+            if handler is None:
+                return None
+
+            self._insert(file_id, handler, spilled[1])
+            return handler
+
+    def _insert(self, file_id: str, handler: CSVHandler, size: int) -> None:
+        if file_id in self._handlers:
+            self._memory_bytes -= self._sizes.pop(file_id)
+            del self._handlers[file_id]
+
+        self._handlers[file_id] = handler
+        self._sizes[file_id] = size
+        self._memory_bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        # Always keep the most recently used entry, even if it alone exceeds the budget
+        while self._memory_bytes > self.max_memory_bytes and len(self._handlers) > 1:
+            file_id, handler = self._handlers.popitem(last=False)
+            size = self._sizes.pop(file_id)
+            self._memory_bytes -= size
+            os.makedirs(self.cache_dir, exist_ok=True)
+            spill_path = self._spill_path(file_id)
+            self._write_spill(spill_path, handler)
+            file_size = os.path.getsize(spill_path)
+            self._spilled[file_id] = (file_size, size)
+            self._spill_bytes += file_size
+        self._prune_spilled()
+
+    def _prune_spilled(self) -> None:
+        # Oldest spill files go first; their uploads must be sent again
+        while self._spill_bytes > self.max_spill_bytes and self._spilled:
+            file_id, (file_size, _) = self._spilled.popitem(last=False)
+            self._spill_bytes -= file_size
+            try:
+                os.remove(self._spill_path(file_id))
+            except FileNotFoundError:
+                pass
@@ -161,6 +161,42 @@ class TestAPIEndpoints:
         assert len(data["errors"]) > 0
         assert any("last_name" in error for error in data["errors"])
     
+    def test_validate_reports_row_errors(self, client):
+        """Test that invalid rows are reported up to max_error_rows."""
+        content = (
+            b"user_id,email,first_name,last_name,age\n"
+            b"USR001,john@example.com,John,Doe,30\n"
+            b"USR002,invalid-email,Jane,Smith,25\n"
+            b"USR003,bob@example.com,Bob,Brown,200\n"
+            b"USR004,amy@example.com,Amy,Jones,41\n"
+        )
+        upload_response = client.post(
+            "/api/upload",
+            files={"file": ("errors.csv", io.BytesIO(content), "text/csv")}
+        )
+        file_id = upload_response.json()["file_id"]
+        mapping = {
+            "user_id": "user_id",
+            "email": "email",
+            "first_name": "first_name",
+            "last_name": "last_name",
+            "age": "age"
+        }
+        
+        response = client.post(
+            "/api/validate",
+            json={"file_id": file_id, "mapping": mapping}
+        )
+        data = response.json()
+        assert data["valid"] is False
+        assert [error["row"] for error in data["row_errors"]] == [2, 3]
+        
+        response = client.post(
+            "/api/validate",
+            json={"file_id": file_id, "mapping": mapping, "max_error_rows": 1}
+        )
+        assert [error["row"] for error in response.json()["row_errors"]] == [2]
+    
     def test_validate_nonexistent_file(self, client):
         """Test validation with nonexistent file ID."""
         response = client.post(
@@ -242,6 +278,15 @@ class TestAPIEndpoints:
         assert "mappings" in data
         assert len(data["mappings"]) >= 1
     
+    def test_list_mappings_pagination(self, client):
+        """Test that limit and offset are validated and applied."""
+        response = client.get("/api/mappings", params={"limit": 1})
+        assert response.status_code == 200
+        assert len(response.json()["mappings"]) <= 1
+        
+        assert client.get("/api/mappings", params={"limit": 0}).status_code == 422
+        assert client.get("/api/mappings", params={"offset": -1}).status_code == 422
+    
     def test_get_mapping(self, client):
         """Test retrieving a specific mapping."""
         # Save a mapping
@@ -305,3 +350,8 @@ class TestAPIEndpoints:
         """Test deleting a mapping that doesn't exist."""
         response = client.delete("/api/mappings/nonexistent_id")
         assert response.status_code == 404
+    
+    def test_index_is_not_a_mapping(self, client):
+        """Test that the reserved listing index cannot be fetched or deleted as a mapping."""
+        assert client.get("/api/mappings/_index").status_code == 404
+        assert client.delete("/api/mappings/_index").status_code == 404
@@ -0,0 +1,99 @@
+"""
+Tests for content-based column classification.
+"""
+import pytest
+import pandas as pd
+from app.column_classifier import ColumnClassifier, _ratio_exceeds
+
+
+class TestRatioExceeds:
+    """Test cases for the early-exit ratio helper."""
+
+    def test_ratio_above_threshold(self):
+        """Test that a clear majority passes."""
+        values = [True] * 90 + [False] * 10
+        assert _ratio_exceeds(values, bool) is True
+
+    def test_ratio_at_threshold(self):
+        """Test that the threshold itself only passes when inclusive."""
+        values = [True] * 80 + [False] * 20
+        assert _ratio_exceeds(values, bool) is False
+        assert _ratio_exceeds(values, bool, inclusive=True) is True
+
+    def test_early_exit_stops_scanning(self):
+        """Test that the scan stops once the outcome is decided."""
+        calls = []
+
+        def predicate(value):
+            calls.append(value)
+            return value
+
+        values = [False] * 300 + [True] * 700
+        assert _ratio_exceeds(values, predicate) is False
+        assert len(calls) < len(values)
+
+
+class TestColumnClassifier:
+    """Test cases for ColumnClassifier predicates."""
+
+    def test_is_email(self):
+        """Test email detection."""
+        assert ColumnClassifier.is_email(pd.Series(["a@example.com", "b@example.org", None]))
+        assert not ColumnClassifier.is_email(pd.Series(["John", "Jane"]))
+
+    def test_is_phone_number(self):
+        """Test phone number detection."""
+        assert ColumnClassifier.is_phone_number(pd.Series(["+1-555-0123456", "555 123 4567"]))
+        assert not ColumnClassifier.is_phone_number(pd.Series(["John", "Jane"]))
+
+    def test_is_date(self):
+        """Test date detection."""
+        assert ColumnClassifier.is_date(pd.Series(["2024-01-01", "01/02/2024"]))
+        assert not ColumnClassifier.is_date(pd.Series(["active", "pending"]))
+
+    def test_is_age(self):
+        """Test age detection."""
+        assert ColumnClassifier.is_age(pd.Series([30, 25, 41]))
+        assert not ColumnClassifier.is_age(pd.Series([300, 250, 410]))
+        assert not ColumnClassifier.is_age(pd.Series(["John", "Jane"]))
+
+    def test_is_user_id(self):
+        """Test user identifier detection."""
+        assert ColumnClassifier.is_user_id(pd.Series(["USR001", "USR002", "USR003"]))
+        assert not ColumnClassifier.is_user_id(pd.Series(["same", "same", "same"]))
+
+    def test_is_status_code(self):
+        """Test status detection is case- and whitespace-insensitive."""
+        assert ColumnClassifier.is_status_code(pd.Series([" Active", "INACTIVE", "pending"]))
+        assert not ColumnClassifier.is_status_code(pd.Series(["open", "closed"]))
+
+    def test_empty_series(self):
+        """Test that empty series never classify."""
+        empty = pd.Series([None, None])
+        assert not ColumnClassifier.is_email(empty)
+        assert not ColumnClassifier.is_age(empty)
+        assert not ColumnClassifier.is_status_code(empty)
+
+    def test_mixed_object_column(self):
+        """Test that non-string values in object columns are still handled."""
+        assert ColumnClassifier.is_user_id(pd.Series(["USR001", 2, "USR003", None], dtype=object))
+
+    def test_classify_matches_individual_checks(self):
+        """Test that classify agrees with the individual predicates."""
+        columns = [
+            pd.Series(["a@example.com", "b@example.org"]),
+            pd.Series(["2024-01-01", "2024-02-01", None]),
+            pd.Series([30, 25, 41]),
+            pd.Series(["USR001", "USR002", "USR003"]),
+            pd.Series(["Active", "pending"]),
+            pd.Series([None, None]),
+        ]
+        for series in columns:
+            assert ColumnClassifier.classify(series) == {
+                "email": ColumnClassifier.is_email(series),
+                "phone": ColumnClassifier.is_phone_number(series),
+                "date": ColumnClassifier.is_date(series),
+                "age": ColumnClassifier.is_age(series),
+                "user_id": ColumnClassifier.is_user_id(series),
+                "status": ColumnClassifier.is_status_code(series),
+            }
@@ -2,8 +2,9 @@
 Tests for CSV handler functionality.
 """
 import pytest
+import io
 import pandas as pd
-from app.csv_handler import CSVHandler
+from app.csv_handler import CSVHandler, _NA_TOKENS
 
 
 class TestCSVHandler:
@@ -131,3 +132,88 @@ class TestCSVHandler:
         # This is harder to detect, but should handle gracefully
         result = handler2.detect_header()
         assert isinstance(result, bool)
+    
+    def test_detect_header_reads_raw_bytes(self, monkeypatch):
+        """Test that header detection works from the leading bytes without pandas."""
+        def fail(*args, **kwargs):
+            raise AssertionError("detect_header should not parse with pandas")
+        
+        monkeypatch.setattr(pd, "read_csv", fail)
+        
+        assert CSVHandler(b"name,age\nJohn,30\nJane,25", "test.csv").detect_header() is True
+        assert CSVHandler(b"1,100\n\n2,200", "test.csv").detect_header() is False
+    
+    def test_detect_header_beyond_probe_window(self, monkeypatch):
+        """Test that records longer than the probe window are still read whole."""
+        monkeypatch.setattr(CSVHandler, "HEADER_PROBE_BYTES", 8)
+        csv_content = b"name,description,age\nJohn,a fairly long description,30\n"
+        
+        handler = CSVHandler(csv_content, "test.csv")
+        
+        assert handler._leading_records(2) == [
+            ["name", "description", "age"],
+            ["John", "a fairly long description", "30"]
+        ]
+        assert handler.detect_header() is True
+    
+    def test_detect_header_treats_na_tokens_as_missing(self):
+        """Test that pandas' NA tokens in the first row don't make it look like a header."""
+        assert CSVHandler(b"John,NA,30\nJane,25,40\n", "test.csv").detect_header() is False
+        assert CSVHandler(b"A,N/A,1\nB,2,3\n", "test.csv").detect_header() is False
+        assert CSVHandler(b"name,age\nJohn,null\n", "test.csv").detect_header() is True
+    
+    def test_na_tokens_match_read_csv_defaults(self):
+        """Test that the local NA-token set matches what read_csv parses as missing."""
+        tokens = sorted(_NA_TOKENS - {""})
+        content = ("value\n" + "\n".join(tokens) + "\n1\n").encode()
+        
+        values = pd.read_csv(io.BytesIO(content), keep_default_na=True)["value"]
+        
+        assert values.isna().tolist() == [True] * len(tokens) + [False]
+    
+    def test_parse_releases_raw_content(self):
+        """Test that raw bytes are released once the CSV is parsed."""
+        csv_content = b"name,email\nJohn,john@example.com"
+        handler = CSVHandler(csv_content, "test.csv")
+        handler.parse()
+        
+        assert handler.file_content == b""
+        assert handler.file_size == len(csv_content)
+        assert handler.validate_file_size() == (True, None)
+    
+    def test_persist_is_opt_in(self, tmp_path, monkeypatch):
+        """Test that uploads are only written to disk when persisted explicitly."""
+        monkeypatch.setattr(CSVHandler, "UPLOADS_DIR", tmp_path)
+        csv_content = b"name,email\nJohn,john@example.com"
+        handler = CSVHandler(csv_content, "test.csv")
+        
+        assert not (tmp_path / "test.csv").exists()
+        
+        file_path = handler.persist()
+        assert file_path == tmp_path / "test.csv"
+        assert file_path.read_bytes() == csv_content
+    
+    def test_persist_keeps_only_the_basename(self, tmp_path, monkeypatch):
+        """Test that directory parts of the client's filename are ignored when persisting."""
+        uploads_dir = tmp_path / "uploads"
+        monkeypatch.setattr(CSVHandler, "UPLOADS_DIR", uploads_dir)
+        
+        for filename, expected in [("cache/file_0123456789abcdef.pkl", "file_0123456789abcdef.pkl"),
+                                   ("../escape.csv", "escape.csv"),
+                                   ("..", "upload.csv")]:
+            file_path = CSVHandler(b"name\nJohn", filename).persist()
+            assert file_path == uploads_dir / expected
+        
+        assert sorted(path.name for path in tmp_path.rglob("*") if path.is_file()) == [
+            "escape.csv", "file_0123456789abcdef.pkl", "upload.csv"
+        ]
+    
+    def test_preview_replaces_nan_and_inf(self):
+        """Test that preview values are JSON-safe."""
+        csv_content = b"name,score\nJohn,inf\nJane,\nBob,1.5"
+        handler = CSVHandler(csv_content, "test.csv")
+        handler.parse()
+        
+        preview = handler.get_preview()
+        
+        assert [row["score"] for row in preview] == [None, None, 1.5]
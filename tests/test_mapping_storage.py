@@ -3,24 +3,20 @@ Tests for mapping storage functionality.
 """
 import pytest
 import os
-import tempfile
-import shutil
+import json
+from app import mapping_storage
 from app.mapping_storage import MappingStorage
 
 
 class TestMappingStorage:
     """Test cases for MappingStorage class."""
     
-    def setup_method(self):
-        """Set up test fixtures with temporary directory."""
-        self.temp_dir = tempfile.mkdtemp()
+    @pytest.fixture(autouse=True)
+    def storage_dir(self, tmp_path):
+        """Root each test's storage in pytest's temporary directory, which pytest cleans up."""
+        self.temp_dir = str(tmp_path)
         self.storage = MappingStorage(storage_dir=self.temp_dir)
     
-    def teardown_method(self):
-        """Clean up temporary directory."""
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-    
     def test_save_mapping(self):
         """Test saving a mapping."""
         mapping = {
@@ -37,12 +33,63 @@ class TestMappingStorage:
         )
         
         assert mapping_id is not None
-        assert len(mapping_id) == 12  # MD5 hash truncated to 12 chars
+        assert len(mapping_id) == 12  # 6 random bytes as hex
         
         # Verify file was created
         filepath = os.path.join(self.temp_dir, f"{mapping_id}.json")
         assert os.path.exists(filepath)
     
+    def test_save_many(self, monkeypatch):
+        """Test that a batch of saves lands on disk and in the index with one index write."""
+        index_writes = []
+        original_write_index = MappingStorage._write_index
+        monkeypatch.setattr(MappingStorage, "_write_index",
+                            lambda storage, rows: index_writes.append(rows) or original_write_index(storage, rows))
+        templates = [
+            {"name": f"Mapping {i}", "description": "desc", "mapping": {"user_id": f"id{i}"}}
+            for i in range(3)
+        ]
+        
+        ids = self.storage.save_many(templates)
+        
+        assert len(index_writes) == 2  # initial empty index, then the batch
+        assert [self.storage.get_mapping(i)["name"] for i in ids] == ["Mapping 0", "Mapping 1", "Mapping 2"]
+        assert [m["id"] for m in self.storage.list_mappings()] == ids[::-1]
+        assert self.storage.save_many([]) == []
+    
+    def test_save_many_invalid_template_writes_nothing(self):
+        """Test that a malformed template is rejected before any file is written."""
+        templates = [
+            {"name": "Good", "description": "desc", "mapping": {"user_id": "id"}},
+            {"name": "Missing description", "mapping": {"user_id": "id"}},
+        ]
+        
+        with pytest.raises(KeyError):
+            self.storage.save_many(templates)
+        
+        assert [name for name in os.listdir(self.temp_dir) if name != "_index.json"] == []
+    
+    def test_save_many_indexes_files_written_before_a_failure(self, monkeypatch):
+        """Test that files already on disk stay listed when a later write fails."""
+        original_write = mapping_storage._write_json
+        writes = []
+        
+        def failing_write(path, data):
+            if not path.endswith("_index.json"):
+                if writes:
+                    raise OSError("disk full")
+                writes.append(path)
+            original_write(path, data)
+        
+        monkeypatch.setattr(mapping_storage, "_write_json", failing_write)
+        templates = [{"name": f"Mapping {i}", "description": "desc", "mapping": {}} for i in range(3)]
+        
+        with pytest.raises(OSError):
+            self.storage.save_many(templates)
+        
+        listed = [m["id"] for m in self.storage.list_mappings()]
+        assert [os.path.join(self.temp_dir, f"{mapping_id}.json") for mapping_id in listed] == writes
+    
     def test_get_mapping(self):
         """Test retrieving a saved mapping."""
         mapping = {
@@ -67,12 +114,45 @@ class TestMappingStorage:
         assert retrieved["mapping"] == mapping
         assert "created_at" in retrieved
         assert "updated_at" in retrieved
+        assert retrieved["created_at"] == retrieved["updated_at"]
+        assert retrieved["created_at"].endswith("+00:00")
+    
+    def test_get_large_mapping(self, monkeypatch):
+        """Test that mappings above the memory-map threshold load the same."""
+        monkeypatch.setattr("app.mapping_storage._MMAP_MIN_BYTES", 0)
+        mapping = {f"field_{i}": f"column_{i}" for i in range(1000)}
+        
+        mapping_id = self.storage.save_mapping("Large", "Many fields", mapping)
+        
+        assert self.storage.get_mapping(mapping_id)["mapping"] == mapping
     
     def test_get_nonexistent_mapping(self):
         """Test retrieving a mapping that doesn't exist."""
         result = self.storage.get_mapping("nonexistent_id")
         assert result is None
     
+    def test_get_mapping_cached(self, monkeypatch):
+        """Test that repeat reads skip the file but still see writes from other instances."""
+        mapping = {"user_id": "id", "email": "email", "first_name": "fname", "last_name": "lname"}
+        mapping_id = self.storage.save_mapping("Cached", "desc", mapping)
+        first = self.storage.get_mapping(mapping_id)
+        first["mapping"]["email"] = "changed"
+        
+        reads = []
+        original_read = mapping_storage._read_json
+        monkeypatch.setattr(mapping_storage, "_read_json", lambda path: reads.append(path) or original_read(path))
+        
+        assert self.storage.get_mapping(mapping_id)["mapping"] == mapping
+        assert reads == []
+        
+        filepath = os.path.join(self.temp_dir, f"{mapping_id}.json")
+        MappingStorage(storage_dir=self.temp_dir).update_mapping(mapping_id, "Renamed", "desc", mapping)
+        os.utime(filepath, ns=(0, 0))
+        reads.clear()
+        
+        assert self.storage.get_mapping(mapping_id)["name"] == "Renamed"
+        assert reads == [filepath]
+    
     def test_list_mappings(self):
         """Test listing all saved mappings."""
         # Save multiple mappings
@@ -95,6 +175,127 @@ class TestMappingStorage:
             assert "description" in m
             assert "created_at" in m
     
+    def test_list_mappings_uses_index(self):
+        """Test that listing is served from the index kept up to date on every write."""
+        mapping = {"user_id": "id", "email": "email", "first_name": "fname", "last_name": "lname"}
+        id1 = self.storage.save_mapping("First", "desc", mapping)
+        id2 = self.storage.save_mapping("Second", "desc", mapping)
+        self.storage.update_mapping(id1, "First (renamed)", "desc", mapping)
+        self.storage.delete_mapping(id2)
+        
+        with open(os.path.join(self.temp_dir, "_index.json")) as f:
+            index = json.load(f)
+        
+        assert [row["id"] for row in index] == [id1]
+        assert index[0]["name"] == "First (renamed)"
+        assert self.storage.list_mappings() == index
+    
+    def test_list_mappings_rebuilds_missing_index(self):
+        """Test that directories without an index are scanned once to build it."""
+        mapping = {"user_id": "id", "email": "email", "first_name": "fname", "last_name": "lname"}
+        old_id = self.storage.save_mapping("Older", "desc", mapping)
+        new_id = self.storage.save_mapping("Newer", "desc", mapping)
+        os.remove(os.path.join(self.temp_dir, "_index.json"))
+        
+        storage = MappingStorage(storage_dir=self.temp_dir)
+        mappings = storage.list_mappings()
+        
+        assert [m["id"] for m in mappings] == [new_id, old_id]
+        assert os.path.exists(os.path.join(self.temp_dir, "_index.json"))
+    
+    def test_rebuild_skips_non_files(self):
+        """Test that directories with a .json suffix are ignored when rebuilding the index."""
+        os.mkdir(os.path.join(self.temp_dir, "backup.json"))
+        
+        assert MappingStorage(storage_dir=self.temp_dir).list_mappings() == []
+    
+    def test_concurrent_saves_keep_index_complete(self):
+        """Test that saves from several threads all land in the index."""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        mapping = {"user_id": "id", "email": "email", "first_name": "fname", "last_name": "lname"}
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            ids = list(pool.map(lambda i: self.storage.save_mapping(f"Mapping {i}", "desc", mapping), range(40)))
+        
+        assert sorted(m["id"] for m in self.storage.list_mappings()) == sorted(ids)
+    
+    def test_concurrent_saves_from_separate_instances(self):
+        """Test that instances sharing a directory never overwrite each other's index rows."""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        mapping = {"user_id": "id", "email": "email", "first_name": "fname", "last_name": "lname"}
+        instances = [MappingStorage(storage_dir=self.temp_dir) for _ in range(4)]
+        
+        def save(i):
+            return instances[i % len(instances)].save_mapping(f"Mapping {i}", "desc", mapping)
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            ids = list(pool.map(save, range(80)))
+        
+        assert sorted(m["id"] for m in MappingStorage(storage_dir=self.temp_dir).list_mappings()) == sorted(ids)
+    
+    def test_cache_hits_do_not_wait_for_index_writes(self):
+        """Test that get_mapping serves cached records while another writer holds the index lock."""
+        import threading
+        
+        mapping = {"user_id": "id", "email": "email", "first_name": "fname", "last_name": "lname"}
+        mapping_id = self.storage.save_mapping("Test", "desc", mapping)
+        self.storage.get_mapping(mapping_id)
+        results = []
+        
+        with self.storage._locked_index():
+            reader = threading.Thread(target=lambda: results.append(self.storage.get_mapping(mapping_id)))
+            reader.start()
+            reader.join(timeout=5)
+            
+            assert results and results[0]["id"] == mapping_id
+    
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+    def test_instance_usable_in_child_forked_while_locked(self):
+        """Test that a child forked while a parent thread holds the locks can still use older instances."""
+        import signal
+        import threading
+        
+        mapping = {"user_id": "id", "email": "email", "first_name": "fname", "last_name": "lname"}
+        mapping_id = self.storage.save_mapping("Test", "desc", mapping)
+        locked, release = threading.Event(), threading.Event()
+        
+        def hold_locks():
+            with self.storage._locked_index(), self.storage._cache_lock:
+                locked.set()
+                release.wait()
+        
+        holder = threading.Thread(target=hold_locks)
+        holder.start()
+        locked.wait()
+        try:
+            pid = os.fork()
+            if pid == 0:
+                # Die instead of hanging if the child deadlocks
+                signal.alarm(5)
+                ok = (self.storage.list_mappings()[0]["id"] == mapping_id
+                      and self.storage.get_mapping(mapping_id) is not None
+                      and self.storage.delete_mapping(mapping_id))
+                os._exit(0 if ok else 1)
+        finally:
+            # The child's index write waits on this process's flock until the holder exits
+            release.set()
+            holder.join()
+        _, status = os.waitpid(pid, 0)
+        
+        assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    
+    def test_list_mappings_pagination(self):
+        """Test that limit and offset page through mappings newest first."""
+        mapping = {"user_id": "id", "email": "email", "first_name": "fname", "last_name": "lname"}
+        ids = [self.storage.save_mapping(f"Mapping {i}", "desc", mapping) for i in range(5)]
+        newest_first = ids[::-1]
+        
+        assert [m["id"] for m in self.storage.list_mappings(limit=2)] == newest_first[:2]
+        assert [m["id"] for m in self.storage.list_mappings(limit=2, offset=2)] == newest_first[2:4]
+        assert [m["id"] for m in self.storage.list_mappings(offset=4)] == newest_first[4:]
+        assert self.storage.list_mappings(limit=2, offset=10) == []
+    
     def test_list_mappings_empty(self):
         """Test listing mappings when none exist."""
         mappings = self.storage.list_mappings()
@@ -148,6 +349,15 @@ class TestMappingStorage:
         assert updated["created_at"] == original_created_at  # Should not change
         assert updated["updated_at"] != original["updated_at"]  # Should change
     
+    def test_writes_leave_no_temporary_files(self):
+        """Test that saves and updates replace files atomically without leftovers."""
+        mapping = {"user_id": "id", "email": "email", "first_name": "fname", "last_name": "lname"}
+        mapping_id = self.storage.save_mapping("Original", "desc", mapping)
+        self.storage.update_mapping(mapping_id, "Updated", "desc", mapping)
+        
+        assert sorted(os.listdir(self.temp_dir)) == sorted(["_index.json", f"{mapping_id}.json"])
+        assert self.storage.get_mapping(mapping_id)["name"] == "Updated"
+    
     def test_update_nonexistent_mapping(self):
         """Test updating a mapping that doesn't exist."""
         success = self.storage.update_mapping(
@@ -158,6 +368,19 @@ class TestMappingStorage:
         )
         assert success is False
     
+    def test_reserved_and_malformed_ids_rejected(self):
+        """Test that the index file and paths outside the ID format are never treated as mappings."""
+        mapping = {"user_id": "id", "email": "email", "first_name": "fname", "last_name": "lname"}
+        mapping_id = self.storage.save_mapping("Kept", "desc", mapping)
+        
+        for bad_id in ["_index", "../mappings/_index", mapping_id.upper(), f"{mapping_id}0"]:
+            assert self.storage.get_mapping(bad_id) is None
+            assert self.storage.update_mapping(bad_id, "Name", "desc", mapping) is False
+            assert self.storage.delete_mapping(bad_id) is False
+        
+        assert os.path.exists(os.path.join(self.temp_dir, "_index.json"))
+        assert [m["id"] for m in self.storage.list_mappings()] == [mapping_id]
+    
     def test_generate_unique_ids(self):
         """Test that generated IDs are unique."""
         mapping = {"user_id": "id", "email": "email", "first_name": "fname", "last_name": "lname"}
@@ -167,6 +390,12 @@ class TestMappingStorage:
         
         assert id1 != id2
     
+    def test_instances_have_no_dict(self):
+        """Test that storage instances use slots instead of a per-instance __dict__."""
+        assert not hasattr(self.storage, "__dict__")
+        with pytest.raises(AttributeError):
+            self.storage.unexpected = True
+    
     def test_storage_directory_creation(self):
         """Test that storage directory is created if it doesn't exist."""
         new_dir = os.path.join(self.temp_dir, "new_storage")
@@ -174,3 +403,12 @@ class TestMappingStorage:
         
         storage = MappingStorage(storage_dir=new_dir)
         assert os.path.exists(new_dir)
+    
+    def test_storage_directory_created_once(self, monkeypatch):
+        """Test that later instances for the same directory skip makedirs."""
+        calls = []
+        monkeypatch.setattr(os, "makedirs", lambda *args, **kwargs: calls.append(args))
+        
+        MappingStorage(storage_dir=self.temp_dir)
+        
+        assert calls == []
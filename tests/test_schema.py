@@ -0,0 +1,151 @@
+"""
+Tests for the schema's vectorized validation.
+"""
+import warnings
+import pytest
+import pandas as pd
+from pydantic import ValidationError
+from app.schema import SCHEMA_FIELDS, UserSchema, field_for_alias, validate_dataframe, validate_record, validate_record_fields
+
+
+class TestValidateDataframe:
+    """Test cases for validate_dataframe."""
+    
+    def setup_method(self):
+        """Set up a frame of valid required fields."""
+        self.base = {
+            "user_id": ["USR001", "USR002", "USR003"],
+            "email": ["a@example.com", "b@example.com", "c@example.com"],
+            "first_name": ["Ann", "Bob", "Cy"],
+            "last_name": ["Lee", "Ray", "Poe"]
+        }
+    
+    def test_valid_frame_has_no_errors(self):
+        """Test that valid rows produce an all-False mask with a column per field."""
+        df = pd.DataFrame({
+            **self.base,
+            "age": [30, None, 150],
+            "phone": ["+1-555-0123", "(123) 456-7890", ""],
+            "status": ["Active", "pending", None]
+        })
+        
+        errors = validate_dataframe(df)
+        
+        assert list(errors.columns) == list(SCHEMA_FIELDS)
+        assert not errors.to_numpy().any()
+    
+    def test_invalid_values_are_flagged(self):
+        """Test that each failing value is flagged under its own field."""
+        df = pd.DataFrame({
+            **self.base,
+            "email": ["a@example.com", "invalid-email", "c@example.com"],
+            "age": [30, 200, 41],
+            "phone": ["+1-555-0123", "+1-555-0124", "12345"],
+            "status": ["closed", "active", "inactive"]
+        })
+        
+        errors = validate_dataframe(df)
+        
+        assert errors["status"].tolist() == [True, False, False]
+        assert errors["email"].tolist() == [False, True, False]
+        assert errors["age"].tolist() == [False, True, False]
+        assert errors["phone"].tolist() == [False, False, True]
+        assert not errors["user_id"].any()
+    
+    def test_missing_required_values(self):
+        """Test that empty or absent required fields are flagged."""
+        df = pd.DataFrame({
+            "user_id": ["USR001", "  ", None],
+            "email": ["a@example.com", "b@example.com", "c@example.com"],
+            "first_name": ["Ann", "", "Cy"]
+        })
+        
+        errors = validate_dataframe(df)
+        
+        assert errors["user_id"].tolist() == [False, True, True]
+        assert errors["first_name"].tolist() == [False, True, False]
+        assert errors["last_name"].all()
+        assert not errors["age"].any()
+    
+    def test_infinite_age_is_flagged_without_warning(self):
+        """Test that inf ages fail validation without numpy's invalid-value warning."""
+        df = pd.DataFrame({**self.base, "age": [30.0, float("inf"), float("-inf")]})
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            errors = validate_dataframe(df)
+        
+        assert errors["age"].tolist() == [False, True, True]
+
+
+class TestFieldForAlias:
+    """Test cases for alias reverse lookup."""
+    
+    def test_field_names_and_aliases(self):
+        """Test that field names and their aliases resolve to the field."""
+        assert field_for_alias("email") == "email"
+        assert field_for_alias("e-mail") == "email"
+        assert field_for_alias("surname") == "last_name"
+    
+    def test_lookup_is_normalized(self):
+        """Test that case, surrounding whitespace and inner spaces are normalized."""
+        assert field_for_alias("  Phone Number ") == "phone"
+        assert field_for_alias("FIRST NAME") == "first_name"
+    
+    def test_unknown_name(self):
+        """Test that unknown names return None."""
+        assert field_for_alias("favourite_colour") is None
+
+
+class TestValidateRecord:
+    """Test cases for the generated record validator."""
+    
+    def expected(self, record):
+        """Result of validating the record through UserSchema."""
+        try:
+            return UserSchema(**record).model_dump(), []
+        except ValidationError as e:
+            return None, [f"{err['loc'][0]}: {err['msg']}" for err in e.errors()]
+    
+    def test_valid_record_is_cleaned(self):
+        """Test that a valid record comes back cleaned like the model would."""
+        record = {
+            "user_id": " USR001 ",
+            "email": "John@Example.com",
+            "first_name": "John",
+            "last_name": "Doe",
+            "age": 30.0,
+            "phone": " +1-555-0123 ",
+            "status": "Active"
+        }
+        
+        cleaned, errors = validate_record(record)
+        
+        assert errors == []
+        assert cleaned == self.expected(record)[0]
+        assert cleaned["user_id"] == "USR001"
+        assert cleaned["age"] == 30
+    
+    @pytest.mark.parametrize("record", [
+        {},
+        {"user_id": "  ", "email": "no-at-sign", "first_name": None, "last_name": 5},
+        {"user_id": "u", "email": "a@b", "first_name": "f", "last_name": "l", "age": 200},
+        {"user_id": "u", "email": "a@b", "first_name": "f", "last_name": "l", "age": 30.5},
+        {"user_id": "u", "email": "a@b", "first_name": "f", "last_name": "l", "age": float("nan")},
+        {"user_id": "u", "email": "a@b", "first_name": "f", "last_name": "l", "phone": "12345"},
+        {"user_id": "u", "email": "a@b", "first_name": "f", "last_name": "l", "status": "closed"},
+    ])
+    def test_errors_match_model(self, record):
+        """Test that error messages match the model's, in field order."""
+        assert validate_record(record) == self.expected(record)
+        
+        _, errors, fields = validate_record_fields(record)
+        assert fields == [error.split(":", 1)[0] for error in errors]
+    
+    def test_unhandled_values_fall_back_to_model(self):
+        """Test that values the generated code does not handle are judged by the model."""
+        base = {"user_id": "u", "email": "a@b", "first_name": "f", "last_name": "l"}
+        
+        for age in ["30", "3_0", " 30 ", "abc"]:
+            record = {**base, "age": age}
+            assert validate_record(record) == self.expected(record)
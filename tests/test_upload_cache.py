@@ -0,0 +1,161 @@
+"""
+Tests for the bounded upload cache.
+"""
+import pytest
+import os
+import pickle
+import pandas as pd
+from app.csv_handler import CSVHandler
+from app.upload_cache import UploadCache, _estimate_memory
+
+
+def make_handler(content: bytes) -> CSVHandler:
+    handler = CSVHandler(content, "test.csv")
+    handler.parse()
+    return handler
+
+
+UNPICKLED = []
+
+
+def mark_unpickled():
+    UNPICKLED.append(True)
+
+
+class Payload:
+    """Object whose unpickling is observable."""
+    
+    def __reduce__(self):
+        return (mark_unpickled, ())
+
+
+class TestUploadCache:
+    """Test cases for UploadCache class."""
+    
+    def test_file_id_is_content_based(self):
+        """Test that identical content yields the same file ID."""
+        assert UploadCache.file_id_for(b"a,b\n1,2") == UploadCache.file_id_for(b"a,b\n1,2")
+        assert UploadCache.file_id_for(b"a,b\n1,2") != UploadCache.file_id_for(b"a,b\n1,3")
+    
+    def test_put_and_get(self, tmp_path):
+        """Test storing and retrieving a handler."""
+        cache = UploadCache(cache_dir=str(tmp_path))
+        content = b"name,email\nJohn,john@example.com"
+        file_id = UploadCache.file_id_for(content)
+        handler = make_handler(content)
+        
+        cache.put(file_id, handler)
+        
+        assert file_id in cache
+        assert cache.get(file_id) is handler
+    
+    def test_get_unknown_id(self, tmp_path):
+        """Test that unknown and malformed IDs return None."""
+        cache = UploadCache(cache_dir=str(tmp_path))
+        
+        assert cache.get("file_0123456789abcdef") is None
+        assert cache.get("../../etc/passwd") is None
+        assert "nonexistent" not in cache
+    
+    def test_eviction_spills_to_disk(self, tmp_path):
+        """Test that entries over the memory budget are spilled and reloaded."""
+        cache = UploadCache(cache_dir=str(tmp_path), max_memory_bytes=1)
+        first_content = b"name,email\nJohn,john@example.com"
+        second_content = b"name,email\nJane,jane@example.com"
+        first_id = UploadCache.file_id_for(first_content)
+        second_id = UploadCache.file_id_for(second_content)
+        
+        cache.put(first_id, make_handler(first_content))
+        cache.put(second_id, make_handler(second_content))
+        
+        # Only the most recent entry stays in memory
+        assert len(cache) == 1
+        assert os.path.exists(os.path.join(str(tmp_path), f"{first_id}.pkl"))
+        assert first_id in cache
+        
+        reloaded = cache.get(first_id)
+        assert reloaded.columns == ["name", "email"]
+        assert reloaded.get_preview()[0]["name"] == "John"
+        assert not os.path.exists(os.path.join(str(tmp_path), f"{first_id}.pkl"))
+    
+    def test_corrupt_spill_file_is_dropped(self, tmp_path):
+        """Test that an unreadable spill file yields None and is removed instead of raising."""
+        cache = UploadCache(cache_dir=str(tmp_path), max_memory_bytes=1)
+        first_content = b"name,email\nJohn,john@example.com"
+        second_content = b"name,email\nJane,jane@example.com"
+        first_id = UploadCache.file_id_for(first_content)
+        cache.put(first_id, make_handler(first_content))
+        cache.put(UploadCache.file_id_for(second_content), make_handler(second_content))
+        
+        spill_path = os.path.join(str(tmp_path), f"{first_id}.pkl")
+        with open(spill_path, "wb") as f:
+            f.write(b"not a pickle")
+        
+        assert cache.get(first_id) is None
+        assert not os.path.exists(spill_path)
+        assert first_id not in cache
+    
+    def test_spill_files_pruned_over_budget(self, tmp_path):
+        """Test that the oldest spill files are deleted once the disk budget is exceeded."""
+        cache = UploadCache(cache_dir=str(tmp_path), max_memory_bytes=1, max_spill_bytes=1)
+        contents = [f"name,email\nUser{i},user{i}@example.com".encode() for i in range(3)]
+        ids = [UploadCache.file_id_for(content) for content in contents]
+        
+        for file_id, content in zip(ids, contents):
+            cache.put(file_id, make_handler(content))
+        
+        # Each spill exceeds the 1-byte budget on its own, so none are kept
+        assert os.listdir(str(tmp_path)) == []
+        assert ids[0] not in cache
+        assert cache.get(ids[2]) is not None
+    
+    def test_unsigned_spill_file_is_not_unpickled(self, tmp_path):
+        """Test that a spill file replaced by someone else is never unpickled."""
+        cache = UploadCache(cache_dir=str(tmp_path), max_memory_bytes=1)
+        first_content = b"name,email\nJohn,john@example.com"
+        second_content = b"name,email\nJane,jane@example.com"
+        first_id = UploadCache.file_id_for(first_content)
+        cache.put(first_id, make_handler(first_content))
+        cache.put(UploadCache.file_id_for(second_content), make_handler(second_content))
+        
+        spill_path = os.path.join(str(tmp_path), f"{first_id}.pkl")
+        with open(spill_path, "wb") as f:
+            f.write(pickle.dumps(Payload()))
+        UNPICKLED.clear()
+        
+        assert cache.get(first_id) is None
+        assert UNPICKLED == []
+        assert not os.path.exists(spill_path)
+    
+    def test_stale_spill_files_are_removed(self, tmp_path):
+        """Test that spill files a new cache did not write are deleted, not adopted."""
+        cache = UploadCache(cache_dir=str(tmp_path), max_memory_bytes=1)
+        first_content = b"name,email\nJohn,john@example.com"
+        second_content = b"name,email\nJane,jane@example.com"
+        first_id = UploadCache.file_id_for(first_content)
+        cache.put(first_id, make_handler(first_content))
+        cache.put(UploadCache.file_id_for(second_content), make_handler(second_content))
+        
+        restarted = UploadCache(cache_dir=str(tmp_path))
+        
+        assert first_id not in restarted
+        assert restarted.get(first_id) is None
+        assert os.listdir(str(tmp_path)) == []
+    
+    def test_default_spill_dir_is_private(self):
+        """Test that the default spill directory is outside the uploads folder and owner-only."""
+        cache = UploadCache()
+        
+        assert os.path.commonpath([cache.cache_dir, str(CSVHandler.UPLOADS_DIR)]) != str(CSVHandler.UPLOADS_DIR)
+        assert os.stat(cache.cache_dir).st_mode & 0o077 == 0
+    
+    def test_memory_estimate_close_to_deep_usage(self):
+        """Test that the sampled size estimate tracks pandas' deep memory usage."""
+        df = pd.DataFrame({
+            "name": [f"user{i}" * (i % 5 + 1) for i in range(20000)],
+            "score": range(20000),
+        })
+        exact = df.memory_usage(deep=True).sum()
+        
+        assert abs(_estimate_memory(df) - exact) / exact < 0.05
+        assert _estimate_memory(None) == 0